@@ -10,17 +10,39 @@ Channels:
 Author: Mboya Jeffers
 """
 
+import atexit
+import itertools
 import json
 import logging
 import os
+import queue
 import smtplib
+import threading
+import time
+from collections import deque
 from dataclasses import dataclass, field
 from datetime import datetime
-from email.mime.multipart import MIMEMultipart
-from email.mime.text import MIMEText
+from email.message import EmailMessage
 from enum import Enum
 from typing import Any, Dict, List, Optional
 
+try:
+    import orjson  # C-implemented JSON encoder, ~3-10x faster than stdlib
+except ImportError:
+    orjson = None
+
+# Flush the buffered alert log once this many bytes or seconds accumulate
+ALERT_LOG_FLUSH_BYTES = 65536
+ALERT_LOG_FLUSH_SECONDS = 1.0
+
+# Non-critical emails are batched into one message per window
+EMAIL_BATCH_SECONDS = 30.0
+
+# Writer thread coalesces up to this many queued entries (or 50 ms of
+# arrivals) into a single write
+ALERT_LOG_BATCH_ENTRIES = 64
+ALERT_LOG_BATCH_WAIT = 0.05
+
 
 class AlertLevel(Enum):
     """Alert severity levels."""
@@ -30,6 +52,15 @@ class AlertLevel(Enum):
     CRITICAL = "critical"
 
 
+# Uppercased level names, computed once instead of .value.upper() per alert
+_LEVEL_UPPER = {level: level.value.upper() for level in AlertLevel}
+
+
+def _fmt_ts(ts: float) -> str:
+    """Format an epoch timestamp as ISO-8601 UTC, only at serialization time."""
+    return datetime.utcfromtimestamp(ts).isoformat(timespec='milliseconds') + 'Z'
+
+
 @dataclass
 class Alert:
     """An alert event."""
@@ -37,7 +68,9 @@ class Alert:
     title: str
     message: str
     details: Dict[str, Any] = field(default_factory=dict)
-    timestamp: str = field(default_factory=lambda: datetime.utcnow().isoformat() + "Z")
+    # Epoch seconds: one C call at construction; ISO formatting happens
+    # lazily at the serialization boundary via _fmt_ts
+    timestamp: float = field(default_factory=time.time)
     source: str = "analytics-platform"
     acknowledged: bool = False
 
@@ -50,7 +83,17 @@ class AlertManager:
 
     def __init__(self):
         self.logger = logging.getLogger("AlertManager")
-        self.alert_history: List[Alert] = []
+        # Level -> logger-method dispatch, built once per instance
+        self._log_dispatch = {
+            AlertLevel.INFO: self.logger.info,
+            AlertLevel.WARNING: self.logger.warning,
+            AlertLevel.ERROR: self.logger.error,
+            AlertLevel.CRITICAL: self.logger.critical,
+        }
+        # The JSONL log is the source of truth for history; keep only a
+        # small mirror of the most recent entries so memory stays O(limit)
+        # regardless of how many alerts the process has ever sent.
+        self._recent: deque = deque(maxlen=100)
 
         # Email config from environment
         self.smtp_host = os.environ.get('SMTP_HOST', 'smtp.gmail.com')
@@ -66,6 +109,33 @@ class AlertManager:
         )
         os.makedirs(os.path.dirname(self.alert_log_path), exist_ok=True)
 
+        # Long-lived buffered writer for the JSONL log; flushed on a
+        # size/time threshold instead of open+write+close per alert.
+        self._alert_fp = open(self.alert_log_path, 'ab', buffering=ALERT_LOG_FLUSH_BYTES)
+        self._write_lock = threading.Lock()
+        self._bytes_buffered = 0
+        self._last_flush = time.monotonic()
+
+        # Disk writes happen on a dedicated thread so send_alert never
+        # blocks on I/O; entries are coalesced into batched writes.
+        self._log_queue: queue.Queue = queue.Queue()
+        self._log_writer = threading.Thread(target=self._writer_loop, daemon=True)
+        self._log_writer.start()
+        atexit.register(self._close_alert_log)
+
+        # Persistent SMTP session, reused across alerts to avoid a
+        # TCP + STARTTLS + login handshake per email.
+        self._smtp: Optional[smtplib.SMTP] = None
+        self._smtp_lock = threading.Lock()
+        self._pending: List[Alert] = []
+        self._pending_lock = threading.Lock()
+        self._email_flusher = threading.Thread(
+            target=self._email_flush_loop, daemon=True
+        )
+        self._email_flusher.start()
+        atexit.register(self.flush_pending_emails)
+        atexit.register(self._close_smtp)
+
     def send_alert(self, level: AlertLevel, title: str,
                    details: Optional[Dict[str, Any]] = None,
                    message: str = "") -> Alert:
@@ -74,70 +144,177 @@ class AlertManager:
             level=level, title=title,
             message=message or title, details=details or {},
         )
-        self.alert_history.append(alert)
         self._log_alert(alert)
         self._write_alert_log(alert)
 
-        # Send email for WARNING and above
-        if level in (AlertLevel.WARNING, AlertLevel.ERROR, AlertLevel.CRITICAL):
+        # Email for WARNING and above: CRITICAL goes out immediately,
+        # WARNING/ERROR are batched into one email per window.
+        if level is AlertLevel.CRITICAL:
             self._send_email(alert)
+        elif level in (AlertLevel.WARNING, AlertLevel.ERROR):
+            with self._pending_lock:
+                self._pending.append(alert)
         return alert
 
     def get_recent_alerts(self, limit: int = 50) -> List[Dict[str, Any]]:
-        """Get recent alerts."""
-        alerts = sorted(self.alert_history, key=lambda a: a.timestamp, reverse=True)[:limit]
-        return [
-            {
-                'level': a.level.value, 'title': a.title,
-                'message': a.message, 'details': a.details,
-                'timestamp': a.timestamp, 'acknowledged': a.acknowledged,
-            }
-            for a in alerts
-        ]
+        """Get recent alerts, newest first."""
+        # Writes append in timestamp order, so newest-first is just the
+        # reversed tail. Serve from the in-memory mirror when it has
+        # enough entries; otherwise tail the JSONL log.
+        if limit <= len(self._recent):
+            return list(itertools.islice(reversed(self._recent), limit))
+        return list(reversed(self._tail_alert_log(limit)))
+
+    def _tail_alert_log(self, limit: int) -> List[Dict[str, Any]]:
+        """Read the last `limit` entries from the JSONL log file."""
+        loads = orjson.loads if orjson is not None else json.loads
+        try:
+            # Barrier through the writer queue: entries can sit in the
+            # coalescing window for up to ~1s, so wait for the writer to
+            # drain and flush everything queued so far before reading —
+            # otherwise the newest alerts are invisible to the tail.
+            done = threading.Event()
+            self._log_queue.put((None, done))
+            done.wait(timeout=5.0)
+            with open(self.alert_log_path, 'rb') as f:
+                f.seek(0, os.SEEK_END)
+                size = f.tell()
+                offset = max(0, size - 256 * limit)
+                f.seek(offset)
+                lines = f.read().split(b'\n')
+            if offset > 0:
+                lines = lines[1:]  # drop the partial first line
+            entries = []
+            for line in lines:
+                if not line:
+                    continue
+                try:
+                    entries.append(loads(line))
+                except ValueError:
+                    continue
+            return entries[-limit:]
+        except Exception as e:
+            self.logger.error(f"Failed to read alert log: {e}")
+            return list(self._recent)
 
     def _log_alert(self, alert: Alert):
         """Log alert to standard logger."""
-        log_method = {
-            AlertLevel.INFO: self.logger.info,
-            AlertLevel.WARNING: self.logger.warning,
-            AlertLevel.ERROR: self.logger.error,
-            AlertLevel.CRITICAL: self.logger.critical,
-        }.get(alert.level, self.logger.info)
-        log_method(f"[ALERT:{alert.level.value.upper()}] {alert.title}")
+        log_method = self._log_dispatch.get(alert.level, self.logger.info)
+        log_method(f"[ALERT:{_LEVEL_UPPER[alert.level]}] {alert.title}")
 
     def _write_alert_log(self, alert: Alert):
-        """Append alert to JSONL log file."""
+        """Queue an alert for the background JSONL writer."""
+        entry = {
+            'timestamp': _fmt_ts(alert.timestamp), 'level': alert.level.value,
+            'title': alert.title, 'message': alert.message,
+            'details': alert.details, 'source': alert.source,
+            'acknowledged': alert.acknowledged,
+        }
+        self._recent.append(entry)
+        if alert.level is AlertLevel.CRITICAL:
+            # Block until the writer has flushed this entry so a
+            # CRITICAL alert is durable before we return.
+            done = threading.Event()
+            self._log_queue.put((entry, done))
+            done.wait(timeout=5.0)
+        else:
+            self._log_queue.put((entry, None))
+
+    def _writer_loop(self):
+        """Drain queued alert entries and write them in coalesced batches."""
+        while True:
+            batch = [self._log_queue.get()]
+            deadline = time.monotonic() + ALERT_LOG_BATCH_WAIT
+            # Coalesce a burst; stop batching as soon as a flush-waiting
+            # (CRITICAL) entry is present.
+            while len(batch) < ALERT_LOG_BATCH_ENTRIES and batch[-1][1] is None:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(self._log_queue.get(timeout=timeout))
+                except queue.Empty:
+                    break
+            self._write_batch(batch)
+
+    def _write_batch(self, batch):
+        """Serialize and write one batch of (entry, event) pairs."""
         try:
-            entry = {
-                'timestamp': alert.timestamp, 'level': alert.level.value,
-                'title': alert.title, 'message': alert.message,
-                'details': alert.details, 'source': alert.source,
-            }
-            with open(self.alert_log_path, 'a') as f:
-                f.write(json.dumps(entry) + '\n')
+            # entry=None is a flush barrier from _tail_alert_log: it
+            # writes nothing but forces the flush below
+            if orjson is not None:
+                data = b''.join(
+                    orjson.dumps(e) + b'\n' for e, _ in batch if e is not None
+                )
+            else:
+                data = b''.join(
+                    json.dumps(e, separators=(',', ':')).encode() + b'\n'
+                    for e, _ in batch if e is not None
+                )
+            must_flush = any(done is not None for _, done in batch)
+            with self._write_lock:
+                if data:
+                    self._alert_fp.write(data)
+                    self._bytes_buffered += len(data)
+                now = time.monotonic()
+                if (must_flush
+                        or self._bytes_buffered >= ALERT_LOG_FLUSH_BYTES
+                        or now - self._last_flush > ALERT_LOG_FLUSH_SECONDS):
+                    self._alert_fp.flush()
+                    self._bytes_buffered = 0
+                    self._last_flush = now
         except Exception as e:
             self.logger.error(f"Failed to write alert log: {e}")
+        finally:
+            for _, done in batch:
+                if done is not None:
+                    done.set()
 
-    def _send_email(self, alert: Alert):
-        """Send alert via email."""
-        if not self.smtp_user or not self.smtp_password:
-            self.logger.debug("Email not configured, skipping")
-            return
+    def _close_alert_log(self):
+        """Drain, flush, and close the alert log on interpreter shutdown."""
+        try:
+            leftovers = []
+            while True:
+                try:
+                    leftovers.append(self._log_queue.get_nowait())
+                except queue.Empty:
+                    break
+            if leftovers:
+                self._write_batch(leftovers)
+            with self._write_lock:
+                self._alert_fp.flush()
+                self._alert_fp.close()
+        except Exception:
+            pass
 
-        recipients = [r.strip() for r in self.alert_recipients if r.strip()]
-        if not recipients:
-            return
+    def _get_smtp(self) -> smtplib.SMTP:
+        """Get the cached SMTP session, reconnecting if it has gone stale."""
+        if self._smtp is not None:
+            try:
+                self._smtp.noop()
+                return self._smtp
+            except (smtplib.SMTPServerDisconnected, smtplib.SMTPException, OSError):
+                self._close_smtp()
 
-        try:
-            msg = MIMEMultipart()
-            msg['From'] = self.alert_from
-            msg['To'] = ', '.join(recipients)
-            msg['Subject'] = f"[{alert.level.value.upper()}] {alert.title}"
+        server = smtplib.SMTP(self.smtp_host, self.smtp_port)
+        server.starttls()
+        server.login(self.smtp_user, self.smtp_password)
+        self._smtp = server
+        return server
 
-            body = f"""Platform Alert
-{'=' * 40}
-Level: {alert.level.value.upper()}
-Time: {alert.timestamp}
+    def _close_smtp(self):
+        """Close the cached SMTP session if open."""
+        if self._smtp is not None:
+            try:
+                self._smtp.quit()
+            except Exception:
+                pass
+            self._smtp = None
+
+    def _format_alert_block(self, alert: Alert) -> str:
+        """Format one alert as a plain-text email section."""
+        return f"""Level: {_LEVEL_UPPER[alert.level]}
+Time: {_fmt_ts(alert.timestamp)}
 Source: {alert.source}
 
 {alert.title}
@@ -147,16 +324,67 @@ Source: {alert.source}
 Details:
 {json.dumps(alert.details, indent=2)}
 """
-            msg.attach(MIMEText(body, 'plain'))
 
-            with smtplib.SMTP(self.smtp_host, self.smtp_port) as server:
-                server.starttls()
-                server.login(self.smtp_user, self.smtp_password)
-                server.send_message(msg)
+    def _deliver_email(self, subject: str, body: str):
+        """Deliver one email over the persistent SMTP session."""
+        if not self.smtp_user or not self.smtp_password:
+            self.logger.debug("Email not configured, skipping")
+            return
+
+        recipients = [r.strip() for r in self.alert_recipients if r.strip()]
+        if not recipients:
+            return
+
+        try:
+            # Single-part plain text: no multipart wrapper or boundary
+            msg = EmailMessage()
+            msg['From'] = self.alert_from
+            msg['To'] = ', '.join(recipients)
+            msg['Subject'] = subject
+            msg.set_content(body)
+
+            with self._smtp_lock:
+                server = self._get_smtp()
+                # One sendmail call delivers to all recipients in a
+                # single DATA transaction.
+                server.sendmail(self.alert_from, recipients, msg.as_bytes())
 
             self.logger.info(f"Alert email sent to {recipients}")
         except Exception as e:
             self.logger.error(f"Failed to send alert email: {e}")
+            self._close_smtp()
+
+    def _send_email(self, alert: Alert):
+        """Send a single alert via email."""
+        subject = f"[{_LEVEL_UPPER[alert.level]}] {alert.title}"
+        body = f"Platform Alert\n{'=' * 40}\n{self._format_alert_block(alert)}"
+        self._deliver_email(subject, body)
+
+    def flush_pending_emails(self):
+        """Flush batched WARNING/ERROR alerts as one digest email."""
+        with self._pending_lock:
+            pending, self._pending = self._pending, []
+        if not pending:
+            return
+
+        if len(pending) == 1:
+            self._send_email(pending[0])
+            return
+
+        top_level = max(pending, key=lambda a: list(AlertLevel).index(a.level))
+        subject = f"[{_LEVEL_UPPER[top_level.level]}] {len(pending)} platform alerts"
+        blocks = '\n'.join(self._format_alert_block(a) for a in pending)
+        body = f"Platform Alerts ({len(pending)})\n{'=' * 40}\n{blocks}"
+        self._deliver_email(subject, body)
+
+    def _email_flush_loop(self):
+        """Background loop that flushes batched alerts once per window."""
+        while True:
+            time.sleep(EMAIL_BATCH_SECONDS)
+            try:
+                self.flush_pending_emails()
+            except Exception as e:
+                self.logger.error(f"Failed to flush pending alerts: {e}")
 
 
 # Global singleton
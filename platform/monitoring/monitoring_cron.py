@@ -16,6 +16,8 @@ Author: Mboya Jeffers
 import sys
 import os
 import shutil
+import socket
+import ssl
 import subprocess
 import json
 from datetime import datetime
@@ -40,14 +42,13 @@ REQUIRED_SERVICES = [
 ]
 
 
-def check_disk():
+def check_disk(mgr):
     """Check disk usage and alert if above threshold."""
     usage = shutil.disk_usage('/')
     used_pct = (usage.used / usage.total) * 100
     free_gb = usage.free / (1024 ** 3)
 
     if used_pct >= DISK_CRIT_PCT:
-        mgr = get_alert_manager()
         mgr.send_alert(
             AlertLevel.CRITICAL,
             f'Disk usage CRITICAL: {used_pct:.1f}%',
@@ -56,7 +57,6 @@ def check_disk():
         )
         logger.error('disk_critical: used_pct=%.1f free_gb=%.1f', used_pct, free_gb)
     elif used_pct >= DISK_WARN_PCT:
-        mgr = get_alert_manager()
         mgr.send_alert(
             AlertLevel.WARNING,
             f'Disk usage WARNING: {used_pct:.1f}%',
@@ -68,7 +68,7 @@ def check_disk():
         logger.info('disk_ok: used_pct=%.1f free_gb=%.1f', used_pct, free_gb)
 
 
-def check_memory():
+def check_memory(mgr):
     """Check memory usage (Linux only)."""
     try:
         with open('/proc/meminfo', 'r') as f:
@@ -85,7 +85,6 @@ def check_memory():
         if total > 0:
             used_pct = ((total - available) / total) * 100
             if used_pct >= MEMORY_CRIT_PCT:
-                mgr = get_alert_manager()
                 mgr.send_alert(
                     AlertLevel.CRITICAL,
                     f'Memory usage CRITICAL: {used_pct:.1f}%',
@@ -94,7 +93,6 @@ def check_memory():
                 )
                 logger.error('memory_critical: used_pct=%.1f', used_pct)
             elif used_pct >= MEMORY_WARN_PCT:
-                mgr = get_alert_manager()
                 mgr.send_alert(
                     AlertLevel.WARNING,
                     f'Memory usage WARNING: {used_pct:.1f}%',
@@ -108,22 +106,24 @@ def check_memory():
         logger.info('memory_check_skipped: reason=not_linux')
 
 
-def check_services():
+def check_services(mgr):
     """Check required systemd services are running."""
-    down_services = []
-    for svc in REQUIRED_SERVICES:
-        try:
-            result = subprocess.run(
-                ['systemctl', 'is-active', svc],
-                capture_output=True, text=True, timeout=5
-            )
-            if result.stdout.strip() != 'active':
-                down_services.append(svc)
-        except (subprocess.TimeoutExpired, FileNotFoundError):
-            down_services.append(svc)
+    # One systemctl invocation covers all units; is-active prints one
+    # status per line, in argument order.
+    try:
+        result = subprocess.run(
+            ['systemctl', 'is-active', *REQUIRED_SERVICES],
+            capture_output=True, text=True, timeout=5
+        )
+        statuses = result.stdout.splitlines()
+        down_services = [
+            svc for i, svc in enumerate(REQUIRED_SERVICES)
+            if i >= len(statuses) or statuses[i].strip() != 'active'
+        ]
+    except (subprocess.TimeoutExpired, FileNotFoundError):
+        down_services = list(REQUIRED_SERVICES)
 
     if down_services:
-        mgr = get_alert_manager()
         mgr.send_alert(
             AlertLevel.ERROR,
             f'{len(down_services)} service(s) down',
@@ -135,29 +135,26 @@ def check_services():
         logger.info('services_ok: count=%d', len(REQUIRED_SERVICES))
 
 
-def check_ssl():
+def check_ssl(mgr):
     """Check SSL certificate expiry."""
     try:
         hostname = os.environ.get('SSL_HOSTNAME', 'localhost')
-        result = subprocess.run(
-            ['openssl', 's_client', '-connect', f'{hostname}:443', '-servername', hostname],
-            input='',
-            capture_output=True, text=True, timeout=10
-        )
-        # Extract expiry from certificate
-        cert_result = subprocess.run(
-            ['openssl', 'x509', '-noout', '-enddate'],
-            input=result.stdout,
-            capture_output=True, text=True, timeout=5
-        )
-        if cert_result.returncode == 0:
-            # Parse: notAfter=Apr 12 00:00:00 2026 GMT
-            expiry_str = cert_result.stdout.strip().replace('notAfter=', '')
+        # Handshake in-process and read the cert as a dict -- no openssl
+        # subprocesses, no stdout piping. getpeercert() only returns the
+        # parsed cert when the chain is verified, so keep the default
+        # verifying context.
+        ctx = ssl.create_default_context()
+        with socket.create_connection((hostname, 443), timeout=5) as sock:
+            with ctx.wrap_socket(sock, server_hostname=hostname) as ssock:
+                cert = ssock.getpeercert()
+
+        if cert and 'notAfter' in cert:
+            # Format: 'Apr 12 00:00:00 2026 GMT'
+            expiry_str = cert['notAfter']
             expiry = datetime.strptime(expiry_str, '%b %d %H:%M:%S %Y %Z')
             days_left = (expiry - datetime.utcnow()).days
 
             if days_left <= 7:
-                mgr = get_alert_manager()
                 mgr.send_alert(
                     AlertLevel.CRITICAL,
                     f'SSL certificate expires in {days_left} days',
@@ -166,7 +163,6 @@ def check_ssl():
                 )
                 logger.error('ssl_critical: days_left=%d', days_left)
             elif days_left <= 30:
-                mgr = get_alert_manager()
                 mgr.send_alert(
                     AlertLevel.WARNING,
                     f'SSL certificate expires in {days_left} days',
@@ -176,28 +172,50 @@ def check_ssl():
                 logger.warning('ssl_warning: days_left=%d', days_left)
             else:
                 logger.info('ssl_ok: days_left=%d', days_left)
+    except ssl.SSLCertVerificationError as e:
+        # An expired or otherwise invalid cert fails the handshake
+        # itself -- exactly the case this check exists to catch, so
+        # alert rather than logging it as a probe failure.
+        mgr.send_alert(
+            AlertLevel.CRITICAL,
+            'SSL certificate failed verification',
+            details={'error': str(e)},
+            message=f'SSL certificate is invalid or expired: {e}. Renew immediately.'
+        )
+        logger.error('ssl_invalid: error=%s', str(e))
     except Exception as e:
         logger.warning('ssl_check_failed: error=%s', str(e))
 
 
-def check_database():
+# Cached PostgreSQL connection, shared by all DB checks in a run so we
+# pay the TCP/SSL/auth handshake once instead of per check.
+_db_conn = None
+
+
+def _get_db_conn():
+    """Get (or lazily open) the shared PostgreSQL connection."""
+    global _db_conn
+    if _db_conn is not None and not _db_conn.closed:
+        return _db_conn
+    import psycopg2
+    _db_conn = psycopg2.connect(
+        host=os.environ.get('DB_HOST', 'localhost'),
+        port=os.environ.get('DB_PORT', '5432'),
+        database=os.environ.get('DB_NAME', 'analytics_platform'),
+        user=os.environ.get('DB_USER', 'app_user'),
+        password=os.environ.get('DB_PASSWORD', ''),
+    )
+    return _db_conn
+
+
+def check_database(mgr):
     """Check PostgreSQL connectivity."""
     try:
-        import psycopg2
-        conn = psycopg2.connect(
-            host=os.environ.get('DB_HOST', 'localhost'),
-            port=os.environ.get('DB_PORT', '5432'),
-            database=os.environ.get('DB_NAME', 'analytics_platform'),
-            user=os.environ.get('DB_USER', 'app_user'),
-            password=os.environ.get('DB_PASSWORD', ''),
-        )
-        cur = conn.cursor()
-        cur.execute('SELECT 1')
-        cur.close()
-        conn.close()
+        conn = _get_db_conn()
+        with conn.cursor() as cur:
+            cur.execute('SELECT 1')
         logger.info('database_ok')
     except Exception as e:
-        mgr = get_alert_manager()
         mgr.send_alert(
             AlertLevel.CRITICAL,
             'Database connection failed',
@@ -207,30 +225,20 @@ def check_database():
         logger.error('database_failed: error=%s', str(e))
 
 
-def check_stuck_jobs(max_minutes=30):
+def check_stuck_jobs(mgr, max_minutes=30):
     """Alert on jobs stuck in PROCESSING state for too long."""
     try:
-        import psycopg2
-        conn = psycopg2.connect(
-            host=os.environ.get('DB_HOST', 'localhost'),
-            port=os.environ.get('DB_PORT', '5432'),
-            database=os.environ.get('DB_NAME', 'analytics_platform'),
-            user=os.environ.get('DB_USER', 'app_user'),
-            password=os.environ.get('DB_PASSWORD', ''),
-        )
-        cur = conn.cursor()
-        cur.execute("""
-            SELECT id, status, updated_at
-            FROM jobs
-            WHERE status IN ('processing', 'validating')
-              AND updated_at < NOW() - INTERVAL '%s minutes'
-        """, (max_minutes,))
-        stuck = cur.fetchall()
-        cur.close()
-        conn.close()
+        conn = _get_db_conn()
+        with conn.cursor() as cur:
+            cur.execute("""
+                SELECT id, status, updated_at
+                FROM jobs
+                WHERE status IN ('processing', 'validating')
+                  AND updated_at < NOW() - INTERVAL '1 minute' * %s
+            """, (max_minutes,))
+            stuck = cur.fetchall()
 
         if stuck:
-            mgr = get_alert_manager()
             mgr.send_alert(
                 AlertLevel.WARNING,
                 f'{len(stuck)} stuck job(s) detected',
@@ -247,12 +255,15 @@ def check_stuck_jobs(max_minutes=30):
 def main():
     """Run all monitoring checks."""
     logger.info('monitoring_cron_start')
-    check_disk()
-    check_memory()
-    check_services()
-    check_ssl()
-    check_database()
-    check_stuck_jobs()
+    mgr = get_alert_manager()
+    check_disk(mgr)
+    check_memory(mgr)
+    check_services(mgr)
+    check_ssl(mgr)
+    check_database(mgr)
+    check_stuck_jobs(mgr)
+    if _db_conn is not None and not _db_conn.closed:
+        _db_conn.close()
     logger.info('monitoring_cron_complete')
 
 
@@ -6,11 +6,34 @@ PostgreSQL backend with UPDATE/DELETE triggers preventing modification.
 Author: Mboya Jeffers
 """
 
+import atexit
+import csv
+import io
 import json
 import logging
 import os
+import queue
+import threading
+import time
 from datetime import datetime
 
+try:
+    import orjson  # C-implemented JSON encoder, ~3-10x faster than stdlib
+except ImportError:
+    orjson = None
+
+# One guarded import at module load: per-call `import psycopg2` inside
+# the hot functions costs an import-lock acquire and sys.modules lookup
+# on every audit write. Without the driver, writes are skipped.
+try:
+    import psycopg2  # noqa: F401
+    from psycopg2.extras import Json, RealDictCursor, execute_values
+    from psycopg2.pool import ThreadedConnectionPool
+    _HAS_PG = True
+except ImportError:
+    Json = None
+    _HAS_PG = False
+
 logger = logging.getLogger(__name__)
 
 DB_CONFIG = {
@@ -21,12 +44,141 @@ DB_CONFIG = {
     'password': os.environ.get('DB_PASSWORD', ''),
 }
 
+# Audit writes are network-latency-bound, so events are queued and a
+# background flusher drains them in batched INSERTs: one round-trip and
+# one commit per batch instead of per event.
+_BATCH_SIZE = 500
+_BATCH_WAIT_SECONDS = 0.2
+_QUEUE_MAX = 10000
+
+# Batches at least this large (bulk backfills, shutdown drains) go
+# through COPY, which beats batched INSERT by 2-5x in PostgreSQL
+_COPY_THRESHOLD = 5000
+
+_COPY_SQL = '''
+    COPY audit_log_immutable
+    (event_type, action, actor, actor_role, resource, resource_id,
+     details, ip_address, user_agent, status)
+    FROM STDIN WITH CSV
+'''
+
+_INSERT_SQL = '''
+    INSERT INTO audit_log_immutable
+    (event_type, action, actor, actor_role, resource, resource_id,
+     details, ip_address, user_agent, status)
+    VALUES %s
+'''
+
+def _dumps(obj):
+    """Serialize details to a JSON string with the fastest encoder available."""
+    if orjson is not None:
+        return orjson.dumps(obj).decode()
+    return json.dumps(obj)
+
+
+_queue: queue.Queue = queue.Queue(maxsize=_QUEUE_MAX)
+_flusher = None
+_flusher_lock = threading.Lock()
+
+# Connection pool, built once: checkout/putback instead of a fresh
+# TCP+TLS+auth handshake per call.
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool():
+    """Get (or lazily build) the shared connection pool."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ThreadedConnectionPool(minconn=1, maxconn=8, **DB_CONFIG)
+    return _pool
+
+
+def _ensure_flusher():
+    """Start the background flusher thread on first use."""
+    global _flusher
+    if _flusher is not None and _flusher.is_alive():
+        return
+    with _flusher_lock:
+        if _flusher is None or not _flusher.is_alive():
+            _flusher = threading.Thread(target=_flush_loop, daemon=True)
+            _flusher.start()
+
+
+def _write_rows(rows):
+    """Write one batch of audit rows on a pooled connection."""
+    pool = _get_pool()
+    conn = pool.getconn()
+    try:
+        cur = conn.cursor()
+        if len(rows) >= _COPY_THRESHOLD:
+            cur.copy_expert(_COPY_SQL, _rows_to_csv(rows))
+        else:
+            execute_values(cur, _INSERT_SQL, rows, page_size=_BATCH_SIZE)
+        conn.commit()
+        cur.close()
+    finally:
+        pool.putconn(conn)
+
+
+def _rows_to_csv(rows):
+    """Render rows as a CSV buffer for COPY FROM STDIN."""
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    for row in rows:
+        details = row[6]
+        if Json is not None and isinstance(details, Json):
+            details = _dumps(details.adapted)
+        writer.writerow(row[:6] + (details,) + row[7:])
+    buf.seek(0)
+    return buf
+
+
+def _flush_loop():
+    """Drain queued audit rows and insert them in batches."""
+    while True:
+        batch = [_queue.get()]
+        deadline = time.monotonic() + _BATCH_WAIT_SECONDS
+        while len(batch) < _BATCH_SIZE:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(_queue.get(timeout=timeout))
+            except queue.Empty:
+                break
+        try:
+            _write_rows(batch)
+        except Exception as e:
+            logger.error(f'Audit log batch write failed: {e}')
+
+
+def _drain_queue():
+    """Flush anything still queued at interpreter shutdown."""
+    rows = []
+    while True:
+        try:
+            rows.append(_queue.get_nowait())
+        except queue.Empty:
+            break
+    if rows:
+        try:
+            _write_rows(rows)
+        except Exception as e:
+            logger.error(f'Audit log shutdown flush failed: {e}')
+
+
+atexit.register(_drain_queue)
+
 
 def log_event(event_type, action, actor=None, actor_role=None,
               resource=None, resource_id=None, details=None,
-              ip_address=None, user_agent=None, status='success'):
+              ip_address=None, user_agent=None, status='success',
+              sync_fallback=True):
     """
-    Append an immutable audit log entry.
+    Append an immutable audit log entry (queued, written in batches).
 
     Args:
         event_type: 'auth', 'api', 'job', 'system', 'etl'
@@ -39,25 +191,37 @@ def log_event(event_type, action, actor=None, actor_role=None,
         ip_address: Source IP address
         user_agent: Client user agent string
         status: 'success', 'failure', 'denied'
+        sync_fallback: When the queue is full, write synchronously
+            instead of dropping. Request-path callers pass False so they
+            never block on the database.
     """
+    if not _HAS_PG:
+        logger.debug(f'Audit event skipped (psycopg2 unavailable): {event_type}/{action}')
+        return
+    # Wrap details in the psycopg2 Json adapter: serialization happens
+    # in the flusher thread at execute time, not on the caller's path
+    if details:
+        details_param = Json(details, dumps=_dumps) if Json is not None else _dumps(details)
+    else:
+        details_param = None
+    row = (
+        event_type, action, actor or 'system', actor_role,
+        resource, resource_id, details_param,
+        ip_address, user_agent, status,
+    )
     try:
-        import psycopg2
-        conn = psycopg2.connect(**DB_CONFIG)
-        cur = conn.cursor()
-        cur.execute('''
-            INSERT INTO audit_log_immutable
-            (event_type, action, actor, actor_role, resource, resource_id,
-             details, ip_address, user_agent, status)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-        ''', (
-            event_type, action, actor or 'system', actor_role,
-            resource, resource_id,
-            json.dumps(details) if details else None,
-            ip_address, user_agent, status,
-        ))
-        conn.commit()
-        cur.close()
-        conn.close()
+        _ensure_flusher()
+        _queue.put_nowait(row)
+    except queue.Full:
+        # Queue saturated: fall back to a synchronous single-row insert
+        # rather than dropping the event, unless the caller can't block.
+        if not sync_fallback:
+            logger.error(f'Audit queue full, dropping event: {event_type}/{action}')
+            return
+        try:
+            _write_rows([row])
+        except Exception as e:
+            logger.error(f'Audit log write failed: {e}')
     except Exception as e:
         logger.error(f'Audit log write failed: {e}')
 
@@ -83,12 +247,27 @@ def log_job(action, job_id, actor=None, details=None, status='success'):
               resource_id=str(job_id), status=status, details=details)
 
 
-def query_audit_log(event_type=None, actor=None, since=None, limit=100):
-    """Query the audit log (read-only). Returns list of dicts."""
+def query_audit_log(event_type=None, actor=None, since=None, limit=100,
+                    before=None):
+    """
+    Query the audit log (read-only). Returns list of dicts.
+
+    Paginate with keyset instead of OFFSET: pass the last row's
+    timestamp back as `before` to fetch the next page. Each page is
+    then an O(log N) index seek on idx_audit_log_timestamp instead of
+    scanning and discarding `offset` rows.
+    """
+    if not _HAS_PG:
+        return []
+    try:
+        pool = _get_pool()
+        conn = pool.getconn()
+    except Exception as e:
+        logger.error(f'Audit log query failed: {e}')
+        return []
+    # Return the connection in a finally (as _write_rows does) so a
+    # failed query can't leak it from the pool.
     try:
-        import psycopg2
-        from psycopg2.extras import RealDictCursor
-        conn = psycopg2.connect(**DB_CONFIG)
         cur = conn.cursor(cursor_factory=RealDictCursor)
 
         query = 'SELECT * FROM audit_log_immutable WHERE 1=1'
@@ -103,6 +282,9 @@ def query_audit_log(event_type=None, actor=None, since=None, limit=100):
         if since:
             query += ' AND timestamp >= %s'
             params.append(since)
+        if before:
+            query += ' AND timestamp < %s'
+            params.append(before)
 
         query += ' ORDER BY timestamp DESC LIMIT %s'
         params.append(limit)
@@ -110,8 +292,9 @@ def query_audit_log(event_type=None, actor=None, since=None, limit=100):
         cur.execute(query, params)
         rows = cur.fetchall()
         cur.close()
-        conn.close()
         return [dict(r) for r in rows]
     except Exception as e:
         logger.error(f'Audit log query failed: {e}')
         return []
+    finally:
+        pool.putconn(conn)
@@ -7,9 +7,11 @@ Author: Mboya Jeffers
 """
 
 import logging
-from functools import wraps
+import sys
+from collections import namedtuple
+from functools import lru_cache, wraps
 
-from flask import jsonify, request, session
+from flask import g, jsonify, request, session
 
 logger = logging.getLogger(__name__)
 
@@ -38,9 +40,63 @@ ROLES = {
 }
 
 
+class Permission(namedtuple('Permission', 'resource action')):
+    """
+    A pre-split, interned (resource, action) permission.
+
+    Call sites that check the same permission repeatedly should build
+    one of these once (e.g. at module level); the check is then pure
+    set membership with identity-fast string compares, no split or
+    endswith on the hot path.
+    """
+    __slots__ = ()
+
+    def __new__(cls, resource, action):
+        return super().__new__(cls, sys.intern(resource), sys.intern(action))
+
+    @classmethod
+    def parse(cls, permission):
+        """Build from a 'resource:action' string ('jobs' -> action '')."""
+        resource, _, action = permission.partition(':')
+        return cls(resource, action)
+
+
+# Permission tables compiled once at import: two frozensets plus two
+# flags per role, so has_permission is hashed lookups instead of a
+# string-parsing scan per call.
+_COMPILED = {
+    role: {
+        'exact': frozenset(
+            Permission.parse(p) for p in cfg['permissions']
+            if p not in ('*', '*:read') and not p.endswith(':*')
+        ),
+        'prefixes': frozenset(
+            sys.intern(p[:-2]) for p in cfg['permissions']
+            if p.endswith(':*') and p != '*:*'
+        ),
+        'star': '*' in cfg['permissions'] or '*:*' in cfg['permissions'],
+        'star_read': '*:read' in cfg['permissions'],
+    }
+    for role, cfg in ROLES.items()
+}
+
+
 def get_user_role():
-    """Get the current user's role from session."""
-    return session.get('user_role', 'admin')
+    """Get the current user's role, cached on flask.g for the request."""
+    try:
+        return g.user_role
+    except AttributeError:
+        g.user_role = session.get('user_role', 'admin')
+        return g.user_role
+
+
+def get_username():
+    """Get the current username, cached on flask.g for the request."""
+    try:
+        return g.username
+    except AttributeError:
+        g.username = session.get('username', 'unknown')
+        return g.username
 
 
 def require_role(*allowed_roles):
@@ -53,32 +109,35 @@ def require_role(*allowed_roles):
         def admin_only():
             ...
     """
+    # Compiled once when the decorator is applied: admin plus the
+    # allowed roles in one frozenset, so the per-request check is a
+    # single hash lookup instead of a tuple scan.
+    allowed = frozenset(allowed_roles) | {'admin'}
+
     def decorator(f):
         @wraps(f)
         def wrapper(*args, **kwargs):
             user_role = get_user_role()
 
-            # Admin always has access
-            if user_role == 'admin':
-                return f(*args, **kwargs)
-
-            # Check if user's role is in allowed list
-            if user_role not in allowed_roles:
+            if user_role not in allowed:
                 logger.warning(
                     f'RBAC denied: role={user_role} tried {request.method} {request.path} '
                     f'(requires: {allowed_roles})'
                 )
-                # Log to audit trail
+                # Log to audit trail. log_event enqueues for the batch
+                # flusher, and sync_fallback=False means a saturated
+                # queue drops rather than stalling the 403 response.
                 try:
                     from core.audit import log_event
                     log_event(
                         'auth', 'rbac_denied',
-                        actor=session.get('username', 'unknown'),
+                        actor=get_username(),
                         actor_role=user_role,
                         resource=request.path,
                         ip_address=request.remote_addr,
                         status='denied',
-                        details={'required_roles': list(allowed_roles), 'method': request.method}
+                        details={'required_roles': list(allowed_roles), 'method': request.method},
+                        sync_fallback=False,
                     )
                 except Exception:
                     pass
@@ -93,26 +152,31 @@ def require_role(*allowed_roles):
     return decorator
 
 
+@lru_cache(maxsize=2048)
 def has_permission(user_role, permission):
-    """Check if a role has a specific permission."""
+    """
+    Check if a role has a specific permission.
+
+    Accepts a Permission tuple (preferred on hot paths) or a
+    'resource:action' string. Outcomes are memoized on the
+    (role, permission) pair; call has_permission.cache_clear() if
+    ROLES is ever mutated at runtime.
+    """
     if user_role == 'admin':
         return True
 
-    role_config = ROLES.get(user_role, {})
-    role_perms = role_config.get('permissions', [])
-
-    for perm in role_perms:
-        if perm == '*':
-            return True
-        if perm == permission:
-            return True
-        # Wildcard matching: 'jobs:*' matches 'jobs:read', 'jobs:create', etc.
-        if ':' in perm and perm.endswith(':*'):
-            prefix = perm.split(':')[0]
-            if permission.startswith(prefix + ':'):
-                return True
-        # Read wildcard: '*:read' matches 'jobs:read', 'engines:read', etc.
-        if perm == '*:read' and permission.endswith(':read'):
-            return True
-
-    return False
+    compiled = _COMPILED.get(user_role)
+    if compiled is None:
+        return False
+
+    if isinstance(permission, str):
+        permission = Permission.parse(permission)
+
+    if compiled['star'] or permission in compiled['exact']:
+        return True
+    # Wildcard matching: 'jobs:*' matches 'jobs:read', 'jobs:create', etc.
+    # (a bare resource with no action never wildcard-matches)
+    if permission.action and permission.resource in compiled['prefixes']:
+        return True
+    # Read wildcard: '*:read' matches 'jobs:read', 'engines:read', etc.
+    return compiled['star_read'] and permission.action == 'read'
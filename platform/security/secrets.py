@@ -9,13 +9,53 @@ Usage:
 
 Author: Mboya Jeffers
 """
+import hashlib
 import os
 import logging
+import threading
+import time
 
 logger = logging.getLogger(__name__)
 
-# Cache for loaded secrets
+# Secrets can rotate, so cached values expire after SECRET_TTL seconds
+# (default 5 minutes) and the cache is bounded. Values are stored as
+# (value, expires_at) pairs under a lock; the lock is never held across
+# the Secret Manager network call.
+_CACHE_TTL = int(os.getenv('SECRET_TTL', '300'))
+_CACHE_MAX = 256
 _cache = {}
+_cache_lock = threading.Lock()
+
+# SHA-256 digest of the last value seen per secret, so consumers can
+# tell a real rotation from a no-op TTL refresh without comparing
+# (or retaining) the plaintext value.
+_fingerprints = {}
+
+
+def _cache_get(name):
+    """Return the cached value for name, or None if missing/expired."""
+    with _cache_lock:
+        item = _cache.get(name)
+        if item is None:
+            return None
+        value, expires_at = item
+        if time.monotonic() >= expires_at:
+            del _cache[name]
+            return None
+        return value
+
+
+def _cache_put(name, value):
+    """Store a value with a TTL, evicting expired/oldest entries if full."""
+    with _cache_lock:
+        now = time.monotonic()
+        if len(_cache) >= _CACHE_MAX:
+            for key in [k for k, (_, e) in _cache.items() if e <= now]:
+                del _cache[key]
+            while len(_cache) >= _CACHE_MAX:
+                _cache.pop(next(iter(_cache)))
+        _cache[name] = (value, now + _CACHE_TTL)
+        _fingerprints[name] = hashlib.sha256(value.encode()).digest()
 
 # Whether GCP Secret Manager is available
 _sm_client = None
@@ -55,13 +95,14 @@ def get_secret(name, default=None):
         Secret value as string, or default
     """
     # Check cache first
-    if name in _cache:
-        return _cache[name]
+    cached = _cache_get(name)
+    if cached is not None:
+        return cached
 
     # 1. Check environment variable (highest priority - allows override)
     env_val = os.getenv(name)
     if env_val is not None:
-        _cache[name] = env_val
+        _cache_put(name, env_val)
         return env_val
 
     # 2. Try GCP Secret Manager
@@ -72,7 +113,7 @@ def get_secret(name, default=None):
                 request={"name": secret_path}
             )
             value = response.payload.data.decode("UTF-8")
-            _cache[name] = value
+            _cache_put(name, value)
             logger.debug(f"Secret '{name}' loaded from Secret Manager")
             return value
         except Exception as e:
@@ -104,9 +145,51 @@ def list_secrets():
         return []
 
 
+def secret_fingerprint(name):
+    """
+    Get the SHA-256 digest of a secret's current value.
+
+    Fetches the secret if it isn't cached. Returns None if the secret
+    cannot be resolved.
+    """
+    if _cache_get(name) is None and get_secret(name) is None:
+        return None
+    with _cache_lock:
+        return _fingerprints.get(name)
+
+
+def secret_changed_since(name, prev_digest):
+    """
+    Check whether a secret has rotated since prev_digest was taken.
+
+    Consumers (DB pools, API clients) can skip rebuilding when this
+    returns False on a refresh poll.
+    """
+    return secret_fingerprint(name) != prev_digest
+
+
+def prefetch_secrets(names=None):
+    """
+    Warm the cache for a set of secrets concurrently.
+
+    GCP has no batch read API, but the fetches can overlap: the first
+    call warms the gRPC channel and the rest reuse it. Call at app boot
+    so later DB/API init hits a warm cache.
+
+    Args:
+        names: Secret names to fetch (defaults to PLATFORM_SECRETS)
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    if names is None:
+        names = PLATFORM_SECRETS
+    with ThreadPoolExecutor(max_workers=8) as ex:
+        list(ex.map(get_secret, names))
+
+
 def clear_cache():
     """Clear the secrets cache. Useful for testing."""
-    _cache.clear()
+    with _cache_lock:
+        _cache.clear()
 
 
 # Known platform secrets for documentation
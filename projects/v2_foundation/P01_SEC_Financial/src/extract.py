@@ -9,7 +9,9 @@ Target: 1M+ financial facts across 500+ companies.
 
 import os
 import json
+import threading
 import time
+import zlib
 import requests
 import pandas as pd
 from typing import List, Dict, Optional, Generator
@@ -17,6 +19,11 @@ from concurrent.futures import ThreadPoolExecutor, as_completed
 from tqdm import tqdm
 import logging
 
+try:
+    import orjson  # much faster parse of the multi-MB companyfacts payloads
+except ImportError:
+    orjson = None
+
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
@@ -29,8 +36,61 @@ SEC_COMPANY_FACTS = f"{SEC_BASE_URL}/api/xbrl/companyfacts/CIK{{cik}}.json"
 USER_AGENT = "Mboya Jeffers MboyaJeffers9@gmail.com"
 
 # Rate limiting: SEC allows 10 requests/second
-REQUEST_DELAY = 0.12
-MAX_WORKERS = 5  # Parallel threads for extraction
+REQUESTS_PER_SECOND = 10
+MAX_WORKERS = 10  # Parallel threads for extraction (matches the 10/s budget)
+
+# Cached responses older than this are revalidated with a conditional
+# GET (If-None-Match / If-Modified-Since): a 304 skips the megabyte-scale
+# body transfer while still picking up fresh filings.
+CACHE_REVALIDATE_SECONDS = 24 * 3600
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket rate limiter.
+
+    Unlike a fixed inter-request sleep (which serializes the thread pool
+    to one request per delay), a bucket lets up to `capacity` requests
+    fire concurrently while the refill rate keeps the average inside the
+    allowed requests/second.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a token is available, then consume it."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(
+                    self.capacity,
+                    self._tokens + (now - self._updated) * self.rate
+                )
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+def _loads(raw):
+    """Parse JSON bytes with orjson when available, stdlib otherwise."""
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
+
+def _dumps(obj) -> bytes:
+    """Serialize to JSON bytes with orjson when available, stdlib otherwise."""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj).encode()
 
 
 class SECBulkExtractor:
@@ -41,53 +101,152 @@ class SECBulkExtractor:
     """
 
     def __init__(self, cache_dir: str = "./data/cache"):
-        self.session = requests.Session()
-        self.session.headers.update({
-            "User-Agent": USER_AGENT,
-            "Accept-Encoding": "gzip, deflate"
-        })
+        # One session per worker thread: requests.Session is not
+        # thread-safe, and extract_bulk fans requests across a pool
+        self._local = threading.local()
         self.cache_dir = cache_dir
         os.makedirs(cache_dir, exist_ok=True)
-        self._last_request = 0
+
+        # Responses are cached in one append-only shard of compressed
+        # records plus an offset index, instead of one JSON file per URL
+        # (thousands of small files whose stat/open cost dominates).
+        self._shard_path = os.path.join(cache_dir, "cache.bin")
+        self._index_path = os.path.join(cache_dir, "cache.idx")
+        self._cache_index = {}
+        self._cache_lock = threading.Lock()
+        self._load_cache_index()
+        self._shard_fp = open(self._shard_path, "ab")
+        self._index_fp = open(self._index_path, "a")
+
+        self._limiter = TokenBucket(REQUESTS_PER_SECOND, REQUESTS_PER_SECOND)
+        self._stats_lock = threading.Lock()
         self.stats = {
             "companies_processed": 0,
             "facts_extracted": 0,
             "errors": 0
         }
 
-    def _rate_limit(self):
-        """Ensure we don't exceed SEC rate limits."""
-        elapsed = time.time() - self._last_request
-        if elapsed < REQUEST_DELAY:
-            time.sleep(REQUEST_DELAY - elapsed)
-        self._last_request = time.time()
+    @property
+    def session(self) -> requests.Session:
+        """Thread-local session with the standard SEC headers."""
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = requests.Session()
+            session.headers.update({
+                "User-Agent": USER_AGENT,
+                "Accept-Encoding": "gzip, deflate"
+            })
+            self._local.session = session
+        return session
+
+    def _load_cache_index(self):
+        """Build the in-memory {key: (offset, length)} index from disk."""
+        if not os.path.exists(self._index_path):
+            return
+        with open(self._index_path) as f:
+            for line in f:
+                try:
+                    key, offset, length = line.rstrip("\n").split("\t")
+                    self._cache_index[key] = (int(offset), int(length))
+                except ValueError:
+                    continue
+
+    def _cache_read(self, key: str) -> Optional[Dict]:
+        """Read one cached record {etag, last_modified, fetched_at, data}."""
+        with self._cache_lock:
+            entry = self._cache_index.get(key)
+        if entry is None:
+            # Fall back to (and absorb) a legacy per-URL cache file
+            legacy_path = os.path.join(self.cache_dir, key)
+            if os.path.isfile(legacy_path):
+                with open(legacy_path, 'rb') as f:
+                    data = _loads(f.read())
+                # Legacy files carry no validators; force revalidation
+                return self._cache_write(key, data, fetched_at=0.0)
+            return None
+        offset, length = entry
+        with open(self._shard_path, "rb") as f:
+            f.seek(offset)
+            blob = f.read(length)
+        record = _loads(zlib.decompress(blob))
+        if "data" not in record:
+            # Pre-validator shard record: bare payload
+            record = {"etag": None, "last_modified": None,
+                      "fetched_at": 0.0, "data": record}
+        return record
+
+    def _cache_write(self, key: str, data: Dict, etag: Optional[str] = None,
+                     last_modified: Optional[str] = None,
+                     fetched_at: Optional[float] = None) -> Dict:
+        """Append one compressed response + validators to the shard."""
+        record = {
+            "etag": etag,
+            "last_modified": last_modified,
+            "fetched_at": time.time() if fetched_at is None else fetched_at,
+            "data": data,
+        }
+        blob = zlib.compress(_dumps(record))
+        with self._cache_lock:
+            offset = self._shard_fp.tell()
+            self._shard_fp.write(blob)
+            self._shard_fp.flush()
+            self._index_fp.write(f"{key}\t{offset}\t{len(blob)}\n")
+            self._index_fp.flush()
+            self._cache_index[key] = (offset, len(blob))
+        return record
 
     def _get(self, url: str, use_cache: bool = True) -> Optional[Dict]:
-        """Make rate-limited GET request with caching."""
+        """Make rate-limited GET request with caching and revalidation."""
         # Check cache
         cache_key = url.split("/")[-1]
-        cache_path = os.path.join(self.cache_dir, cache_key)
-
-        if use_cache and os.path.exists(cache_path):
-            with open(cache_path, 'r') as f:
-                return json.load(f)
 
-        self._rate_limit()
+        cached = None
+        if use_cache:
+            cached = self._cache_read(cache_key)
+            if cached is not None:
+                age = time.time() - cached.get("fetched_at", 0.0)
+                if age < CACHE_REVALIDATE_SECONDS:
+                    return cached["data"]
+
+        self._limiter.acquire()
+
+        # Stale hit: revalidate with SEC's own ETag/Last-Modified so an
+        # unchanged payload comes back as a bodyless 304
+        headers = {}
+        if cached is not None:
+            if cached.get("etag"):
+                headers["If-None-Match"] = cached["etag"]
+            if cached.get("last_modified"):
+                headers["If-Modified-Since"] = cached["last_modified"]
 
         try:
-            response = self.session.get(url, timeout=30)
+            response = self.session.get(url, timeout=30, headers=headers)
+
+            if response.status_code == 304 and cached is not None:
+                # Unchanged: refresh the validators' clock and serve cached
+                self._cache_write(
+                    cache_key, cached["data"],
+                    etag=cached.get("etag"),
+                    last_modified=cached.get("last_modified"),
+                )
+                return cached["data"]
+
             response.raise_for_status()
             data = response.json()
 
-            # Cache response
-            with open(cache_path, 'w') as f:
-                json.dump(data, f)
+            # Cache response alongside its validators
+            self._cache_write(
+                cache_key, data,
+                etag=response.headers.get("ETag"),
+                last_modified=response.headers.get("Last-Modified"),
+            )
 
             return data
 
         except Exception as e:
             logger.debug(f"Error fetching {url}: {e}")
-            return None
+            # A stale cached copy beats nothing when SEC is unreachable
+            return cached["data"] if cached is not None else None
 
     def get_all_company_tickers(self) -> pd.DataFrame:
         """
@@ -129,108 +288,125 @@ class SECBulkExtractor:
         url = SEC_COMPANY_FACTS.format(cik=cik)
         return self._get(url)
 
-    def extract_facts_to_rows(self, company_data: Dict, cik: str) -> List[Dict]:
+    # SEC field name -> output column name
+    _FACT_COLUMNS = {
+        "val": "value",
+        "fy": "fiscal_year",
+        "fp": "fiscal_period",
+        "form": "form",
+        "filed": "filed",
+        "start": "start_date",
+        "end": "end_date",
+        "accn": "accession_number",
+    }
+
+    def extract_facts_to_frame(self, company_data: Dict, cik: str) -> pd.DataFrame:
         """
-        Convert company facts JSON to flat rows.
+        Convert company facts JSON to a flat DataFrame.
+
+        Builds one small frame per (taxonomy, metric, unit) leaf straight
+        from the SEC value records and concatenates once, instead of
+        appending millions of per-fact dicts in Python.
 
         Args:
             company_data: Raw company facts from SEC
             cik: Company CIK
 
         Returns:
-            List of fact dictionaries
+            DataFrame with one row per fact
         """
-        rows = []
-
         if not company_data:
-            return rows
+            return pd.DataFrame()
 
         entity_name = company_data.get("entityName", "Unknown")
         facts = company_data.get("facts", {})
 
-        # Process US-GAAP facts
-        us_gaap = facts.get("us-gaap", {})
-        for metric_name, metric_data in us_gaap.items():
-            units = metric_data.get("units", {})
-
-            for unit_type, values in units.items():
-                for val in values:
-                    rows.append({
-                        "cik": cik,
-                        "entity_name": entity_name,
-                        "taxonomy": "us-gaap",
-                        "metric": metric_name,
-                        "unit": unit_type,
-                        "value": val.get("val"),
-                        "fiscal_year": val.get("fy"),
-                        "fiscal_period": val.get("fp"),
-                        "form": val.get("form"),
-                        "filed": val.get("filed"),
-                        "start_date": val.get("start"),
-                        "end_date": val.get("end"),
-                        "accession_number": val.get("accn")
-                    })
-
-        # Process DEI facts (Document and Entity Information)
-        dei = facts.get("dei", {})
-        for metric_name, metric_data in dei.items():
-            units = metric_data.get("units", {})
-
-            for unit_type, values in units.items():
-                for val in values:
-                    rows.append({
-                        "cik": cik,
-                        "entity_name": entity_name,
-                        "taxonomy": "dei",
-                        "metric": metric_name,
-                        "unit": unit_type,
-                        "value": val.get("val"),
-                        "fiscal_year": val.get("fy"),
-                        "fiscal_period": val.get("fp"),
-                        "form": val.get("form"),
-                        "filed": val.get("filed"),
-                        "start_date": val.get("start"),
-                        "end_date": val.get("end"),
-                        "accession_number": val.get("accn")
-                    })
-
-        return rows
-
-    def extract_company(self, cik: str) -> List[Dict]:
+        frames = []
+        for taxonomy in ("us-gaap", "dei"):
+            for metric_name, metric_data in facts.get(taxonomy, {}).items():
+                for unit_type, values in metric_data.get("units", {}).items():
+                    if not values:
+                        continue
+                    df = pd.DataFrame(values)
+                    # Constant columns for the whole leaf: one vectorized
+                    # assignment each instead of per-row dict entries
+                    df["cik"] = cik
+                    df["entity_name"] = entity_name
+                    df["taxonomy"] = taxonomy
+                    df["metric"] = metric_name
+                    df["unit"] = unit_type
+                    frames.append(df)
+
+        if not frames:
+            return pd.DataFrame()
+
+        combined = pd.concat(frames, ignore_index=True)
+        combined = combined.rename(columns=self._FACT_COLUMNS)
+
+        # Normalize to a fixed schema (some leaves omit start/fp/etc.)
+        columns = ["cik", "entity_name", "taxonomy", "metric", "unit"] + \
+            list(self._FACT_COLUMNS.values())
+        return combined.reindex(columns=columns)
+
+    def extract_company(self, cik: str) -> pd.DataFrame:
         """Extract all facts for a single company."""
         try:
             data = self.get_company_facts(cik)
             if data:
-                rows = self.extract_facts_to_rows(data, cik)
-                self.stats["companies_processed"] += 1
-                self.stats["facts_extracted"] += len(rows)
-                return rows
+                df = self.extract_facts_to_frame(data, cik)
+                with self._stats_lock:
+                    self.stats["companies_processed"] += 1
+                    self.stats["facts_extracted"] += len(df)
+                return df
             else:
-                self.stats["errors"] += 1
-                return []
+                with self._stats_lock:
+                    self.stats["errors"] += 1
+                return pd.DataFrame()
         except Exception as e:
             logger.debug(f"Error processing CIK {cik}: {e}")
-            self.stats["errors"] += 1
-            return []
+            with self._stats_lock:
+                self.stats["errors"] += 1
+            return pd.DataFrame()
+
+    @staticmethod
+    def _normalize_batch(batch_df: pd.DataFrame) -> pd.DataFrame:
+        """Coerce one batch to the stable output dtypes for Parquet."""
+        batch_df["value"] = pd.to_numeric(batch_df["value"], errors="coerce")
+        batch_df["fiscal_year"] = pd.to_numeric(batch_df["fiscal_year"], errors="coerce")
+        for col in ("filed", "start_date", "end_date", "accession_number"):
+            batch_df[col] = batch_df[col].astype("string")
+        # These columns repeat a handful of distinct strings across ~1M
+        # rows; category stores each string once plus small integer codes,
+        # and Arrow writes them as dictionary-encoded parquet columns
+        for col in ("cik", "entity_name", "taxonomy", "metric", "unit",
+                    "form", "fiscal_period"):
+            batch_df[col] = batch_df[col].astype("category")
+        return batch_df
 
     def extract_bulk(
         self,
         companies: pd.DataFrame,
         limit: Optional[int] = None,
-        min_facts: int = 1_000_000
+        min_facts: int = 1_000_000,
+        output_path: Optional[str] = None
     ) -> pd.DataFrame:
         """
         Extract financial facts for multiple companies.
 
-        Continues until reaching minimum fact threshold.
+        Continues until reaching minimum fact threshold. When output_path
+        is given, each company batch is appended to a Parquet file as it
+        completes and released, so peak memory is O(batch) instead of
+        O(all facts); the caller reads the file back if it needs a frame.
 
         Args:
             companies: DataFrame with 'cik' column
             limit: Max companies to process
             min_facts: Minimum facts to extract (default 1M)
+            output_path: Stream batches to this Parquet file instead of
+                accumulating everything in memory
 
         Returns:
-            DataFrame with all financial facts
+            DataFrame with all financial facts (empty when streaming)
         """
         ciks = companies["cik"].tolist()
         if limit:
@@ -239,37 +415,93 @@ class SECBulkExtractor:
         logger.info(f"Starting bulk extraction for {len(ciks)} companies...")
         logger.info(f"Target: {min_facts:,} facts minimum")
 
-        all_rows = []
-
-        with tqdm(total=min_facts, desc="Extracting facts", unit=" facts") as pbar:
-            for i, cik in enumerate(ciks):
-                rows = self.extract_company(cik)
-                all_rows.extend(rows)
+        writer = None
+        if output_path:
+            import pyarrow  # noqa: F401 - the to_parquet engine, imported lazily
 
-                # Update progress
-                pbar.n = len(all_rows)
-                pbar.refresh()
+        all_frames = []
+        total_facts = 0
+        processed = 0
 
-                # Check if we've hit minimum
-                if len(all_rows) >= min_facts:
-                    logger.info(f"Reached {len(all_rows):,} facts after {i+1} companies")
-                    break
-
-                # Log progress every 50 companies
-                if (i + 1) % 50 == 0:
-                    logger.info(
-                        f"Progress: {i+1} companies, {len(all_rows):,} facts, "
-                        f"{self.stats['errors']} errors"
-                    )
-
-        df = pd.DataFrame(all_rows)
+        # Extraction is network-latency-bound: fan requests out across a
+        # thread pool (the rate limiter keeps us inside SEC's 10 req/s)
+        # and stop submitting once the fact threshold is reached.
+        batch_size = MAX_WORKERS * 5
+        try:
+            with tqdm(total=min_facts, desc="Extracting facts", unit=" facts") as pbar:
+                with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+                    for start in range(0, len(ciks), batch_size):
+                        batch = ciks[start:start + batch_size]
+                        futures = [executor.submit(self.extract_company, cik) for cik in batch]
+                        batch_frames = []
+                        for future in as_completed(futures):
+                            company_df = future.result()
+                            if len(company_df):
+                                batch_frames.append(company_df)
+                                total_facts += len(company_df)
+                        processed += len(batch)
+
+                        if batch_frames:
+                            if output_path:
+                                import pyarrow as pa
+                                import pyarrow.parquet as pq
+                                batch_df = self._normalize_batch(
+                                    pd.concat(batch_frames, ignore_index=True))
+                                if writer is None:
+                                    table = pa.Table.from_pandas(
+                                        batch_df, preserve_index=False)
+                                    # Widen dictionary indices to int32:
+                                    # Arrow picks the index width per
+                                    # batch, so a first batch with few
+                                    # categories would otherwise lock in
+                                    # int8 and make a later, wider batch
+                                    # fail to cast
+                                    schema = pa.schema([
+                                        pa.field(f.name, pa.dictionary(
+                                            pa.int32(), f.type.value_type))
+                                        if pa.types.is_dictionary(f.type) else f
+                                        for f in table.schema
+                                    ])
+                                    table = table.cast(schema)
+                                    writer = pq.ParquetWriter(output_path, schema)
+                                else:
+                                    # Cast every later batch to the
+                                    # writer's schema so category code
+                                    # widths can't diverge mid-file
+                                    table = pa.Table.from_pandas(
+                                        batch_df, schema=writer.schema,
+                                        preserve_index=False)
+                                writer.write_table(table)
+                            else:
+                                all_frames.extend(batch_frames)
+
+                        # Update progress
+                        pbar.n = total_facts
+                        pbar.refresh()
+
+                        # Check if we've hit minimum
+                        if total_facts >= min_facts:
+                            logger.info(f"Reached {total_facts:,} facts after {processed} companies")
+                            break
+
+                        logger.info(
+                            f"Progress: {processed} companies, {total_facts:,} facts, "
+                            f"{self.stats['errors']} errors"
+                        )
+        finally:
+            if writer is not None:
+                writer.close()
+
+        if all_frames:
+            df = self._normalize_batch(pd.concat(all_frames, ignore_index=True))
+        else:
+            df = pd.DataFrame()
 
         logger.info(f"\n{'='*60}")
         logger.info("EXTRACTION COMPLETE")
         logger.info(f"{'='*60}")
         logger.info(f"Companies processed: {self.stats['companies_processed']:,}")
-        logger.info(f"Total facts extracted: {len(df):,}")
-        logger.info(f"Unique metrics: {df['metric'].nunique():,}")
+        logger.info(f"Total facts extracted: {total_facts:,}")
         logger.info(f"Errors: {self.stats['errors']}")
         logger.info(f"{'='*60}")
 
@@ -301,19 +533,29 @@ def extract_sec_financial_facts(
     # Note: This is a heuristic - larger tickers tend to have more filings
     companies = companies.sort_values("ticker")
 
-    # Extract facts
-    facts_df = extractor.extract_bulk(
+    # Extract facts, streaming batches straight to parquet so the full
+    # fact set is never resident as Python objects
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    extractor.extract_bulk(
         companies,
         limit=company_limit,
-        min_facts=min_facts
+        min_facts=min_facts,
+        output_path=output_path
     )
-
-    # Save to parquet for efficient storage
-    os.makedirs(os.path.dirname(output_path), exist_ok=True)
-    facts_df.to_parquet(output_path, index=False)
-    logger.info(f"Saved {len(facts_df):,} facts to {output_path}")
-
-    return facts_df
+    logger.info(f"Saved {extractor.stats['facts_extracted']:,} facts to {output_path}")
+
+    # Zero facts: no batch was ever flushed, so the writer (and file)
+    # never existed — return an empty frame with the output schema
+    # instead of failing the read-back
+    if not os.path.exists(output_path):
+        columns = ["cik", "entity_name", "taxonomy", "metric", "unit"] + \
+            list(extractor._FACT_COLUMNS.values())
+        return pd.DataFrame(columns=columns)
+
+    # Read back columnar, Arrow-backed: strings stay as Arrow buffers
+    # instead of boxed Python objects, so the transform's dedups and
+    # key maps hash compact values (and use roughly half the memory)
+    return pd.read_parquet(output_path, dtype_backend="pyarrow")
 
 
 if __name__ == "__main__":
@@ -56,136 +56,187 @@ METRIC_MAPPINGS = {
 }
 
 
+def build_canonical_to_ids(dim_metric: pd.DataFrame) -> Dict[str, frozenset]:
+    """
+    Resolve each canonical METRIC_MAPPINGS name to its metric_ids once.
+
+    The per-slice helpers take these frozensets directly, so no call
+    ever re-scans dim_metric.
+    """
+    name_to_id = dict(zip(dim_metric["metric"], dim_metric["metric_id"]))
+    return {
+        canon: frozenset(name_to_id[n] for n in names if n in name_to_id)
+        for canon, names in METRIC_MAPPINGS.items()
+    }
+
+
 def get_metric_value(
-    facts_df: pd.DataFrame,
-    company_id: int,
-    date_id: int,
-    metric_names: List[str],
-    dim_metric: pd.DataFrame
+    sub: pd.DataFrame,
+    metric_ids: frozenset
 ) -> Optional[float]:
     """
-    Get metric value for a company/period, trying multiple XBRL tag names.
+    Get a metric value from one (company, date) slice across
+    equivalent XBRL tags.
     """
-    # Get metric IDs for the given names
-    metric_ids = dim_metric[dim_metric["metric"].isin(metric_names)]["metric_id"].tolist()
-
     if not metric_ids:
         return None
 
-    # Filter facts
-    matches = facts_df[
-        (facts_df["company_id"] == company_id) &
-        (facts_df["date_id"] == date_id) &
-        (facts_df["metric_id"].isin(metric_ids))
-    ]
+    matches = sub[sub["metric_id"].isin(metric_ids)]
 
     if len(matches) == 0:
         return None
 
-    # Return the first non-null value
-    values = matches["value"].dropna()
-    if len(values) > 0:
-        return values.iloc[0]
+    # First non-null value via a raw numpy scan - no intermediate
+    # Series allocation on this hot path
+    arr = matches["value"].to_numpy(dtype=float)
+    mask = ~np.isnan(arr)
+    if mask.any():
+        return float(arr[mask.argmax()])
 
     return None
 
 
-def calculate_profitability_kpis(
-    facts_df: pd.DataFrame,
-    company_id: int,
-    date_id: int,
-    dim_metric: pd.DataFrame
-) -> Dict[str, Optional[float]]:
-    """Calculate profitability KPIs."""
-    kpis = {}
+# Canonical metrics needed by the per-slice KPI block, pulled once each
+_SLICE_CANONICALS = (
+    "Revenue", "GrossProfit", "OperatingIncome", "NetIncome",
+    "TotalAssets", "StockholdersEquity",
+    "CurrentAssets", "CurrentLiabilities", "Cash", "Inventory",
+    "TotalLiabilities", "TotalDebt",
+)
 
-    revenue = get_metric_value(facts_df, company_id, date_id, METRIC_MAPPINGS["Revenue"], dim_metric)
-    gross_profit = get_metric_value(facts_df, company_id, date_id, METRIC_MAPPINGS["GrossProfit"], dim_metric)
-    operating_income = get_metric_value(facts_df, company_id, date_id, METRIC_MAPPINGS["OperatingIncome"], dim_metric)
-    net_income = get_metric_value(facts_df, company_id, date_id, METRIC_MAPPINGS["NetIncome"], dim_metric)
-    total_assets = get_metric_value(facts_df, company_id, date_id, METRIC_MAPPINGS["TotalAssets"], dim_metric)
-    equity = get_metric_value(facts_df, company_id, date_id, METRIC_MAPPINGS["StockholdersEquity"], dim_metric)
+_PROFITABILITY_KEYS = ("gross_margin", "operating_margin", "net_margin", "roa", "roe")
+_LIQUIDITY_KEYS = ("current_ratio", "quick_ratio", "cash_ratio")
+_LEVERAGE_KEYS = ("debt_to_equity", "debt_to_assets", "equity_ratio")
 
-    # Gross Margin
-    if revenue and gross_profit and revenue != 0:
-        kpis["gross_margin"] = round(gross_profit / revenue * 100, 2)
 
-    # Operating Margin
-    if revenue and operating_income and revenue != 0:
-        kpis["operating_margin"] = round(operating_income / revenue * 100, 2)
+def calculate_kpis_for_slice(
+    sub: pd.DataFrame,
+    canonical_to_ids: Dict[str, frozenset]
+) -> Dict[str, Optional[float]]:
+    """
+    Calculate every KPI for one (company, date) slice.
 
-    # Net Margin
-    if revenue and net_income and revenue != 0:
-        kpis["net_margin"] = round(net_income / revenue * 100, 2)
+    Each needed metric is looked up exactly once; the three legacy
+    category functions are thin filters over this result.
+    """
+    v = {name: get_metric_value(sub, canonical_to_ids[name])
+         for name in _SLICE_CANONICALS}
+    kpis = {}
 
-    # ROA (Return on Assets)
-    if total_assets and net_income and total_assets != 0:
+    revenue = v["Revenue"]
+    net_income = v["NetIncome"]
+    total_assets = v["TotalAssets"]
+    equity = v["StockholdersEquity"]
+    current_liabilities = v["CurrentLiabilities"]
+    total_debt = v["TotalDebt"]
+
+    # Profitability
+    if revenue and v["GrossProfit"]:
+        kpis["gross_margin"] = round(v["GrossProfit"] / revenue * 100, 2)
+    if revenue and v["OperatingIncome"]:
+        kpis["operating_margin"] = round(v["OperatingIncome"] / revenue * 100, 2)
+    if revenue and net_income:
+        kpis["net_margin"] = round(net_income / revenue * 100, 2)
+    if total_assets and net_income:
         kpis["roa"] = round(net_income / total_assets * 100, 2)
-
-    # ROE (Return on Equity)
-    if equity and net_income and equity != 0:
+    if equity and net_income:
         kpis["roe"] = round(net_income / equity * 100, 2)
 
+    # Liquidity
+    if v["CurrentAssets"] and current_liabilities:
+        kpis["current_ratio"] = round(v["CurrentAssets"] / current_liabilities, 2)
+    if v["CurrentAssets"] and v["Inventory"] and current_liabilities:
+        kpis["quick_ratio"] = round(
+            (v["CurrentAssets"] - v["Inventory"]) / current_liabilities, 2)
+    if v["Cash"] and current_liabilities:
+        kpis["cash_ratio"] = round(v["Cash"] / current_liabilities, 2)
+
+    # Leverage
+    if total_debt and equity:
+        kpis["debt_to_equity"] = round(total_debt / equity, 2)
+    if total_debt and total_assets:
+        kpis["debt_to_assets"] = round(total_debt / total_assets * 100, 2)
+    if equity and total_assets:
+        kpis["equity_ratio"] = round(equity / total_assets * 100, 2)
+
     return kpis
 
 
-def calculate_liquidity_kpis(
-    facts_df: pd.DataFrame,
-    company_id: int,
-    date_id: int,
-    dim_metric: pd.DataFrame
+def calculate_profitability_kpis(
+    sub: pd.DataFrame,
+    canonical_to_ids: Dict[str, frozenset]
 ) -> Dict[str, Optional[float]]:
-    """Calculate liquidity KPIs."""
-    kpis = {}
-
-    current_assets = get_metric_value(facts_df, company_id, date_id, METRIC_MAPPINGS["CurrentAssets"], dim_metric)
-    current_liabilities = get_metric_value(facts_df, company_id, date_id, METRIC_MAPPINGS["CurrentLiabilities"], dim_metric)
-    cash = get_metric_value(facts_df, company_id, date_id, METRIC_MAPPINGS["Cash"], dim_metric)
-    inventory = get_metric_value(facts_df, company_id, date_id, METRIC_MAPPINGS["Inventory"], dim_metric)
-
-    # Current Ratio
-    if current_assets and current_liabilities and current_liabilities != 0:
-        kpis["current_ratio"] = round(current_assets / current_liabilities, 2)
-
-    # Quick Ratio
-    if current_assets and inventory and current_liabilities and current_liabilities != 0:
-        quick_assets = current_assets - (inventory or 0)
-        kpis["quick_ratio"] = round(quick_assets / current_liabilities, 2)
+    """Calculate profitability KPIs."""
+    full = calculate_kpis_for_slice(sub, canonical_to_ids)
+    return {k: full[k] for k in _PROFITABILITY_KEYS if k in full}
 
-    # Cash Ratio
-    if cash and current_liabilities and current_liabilities != 0:
-        kpis["cash_ratio"] = round(cash / current_liabilities, 2)
 
-    return kpis
+def calculate_liquidity_kpis(
+    sub: pd.DataFrame,
+    canonical_to_ids: Dict[str, frozenset]
+) -> Dict[str, Optional[float]]:
+    """Calculate liquidity KPIs."""
+    full = calculate_kpis_for_slice(sub, canonical_to_ids)
+    return {k: full[k] for k in _LIQUIDITY_KEYS if k in full}
 
 
 def calculate_leverage_kpis(
-    facts_df: pd.DataFrame,
-    company_id: int,
-    date_id: int,
-    dim_metric: pd.DataFrame
+    sub: pd.DataFrame,
+    canonical_to_ids: Dict[str, frozenset]
 ) -> Dict[str, Optional[float]]:
     """Calculate leverage KPIs."""
-    kpis = {}
+    full = calculate_kpis_for_slice(sub, canonical_to_ids)
+    return {k: full[k] for k in _LEVERAGE_KEYS if k in full}
 
-    total_assets = get_metric_value(facts_df, company_id, date_id, METRIC_MAPPINGS["TotalAssets"], dim_metric)
-    total_liabilities = get_metric_value(facts_df, company_id, date_id, METRIC_MAPPINGS["TotalLiabilities"], dim_metric)
-    total_debt = get_metric_value(facts_df, company_id, date_id, METRIC_MAPPINGS["TotalDebt"], dim_metric)
-    equity = get_metric_value(facts_df, company_id, date_id, METRIC_MAPPINGS["StockholdersEquity"], dim_metric)
 
-    # Debt-to-Equity
-    if total_debt and equity and equity != 0:
-        kpis["debt_to_equity"] = round(total_debt / equity, 2)
+def _truthy(arr: np.ndarray) -> np.ndarray:
+    """Mask of entries that are present and non-zero (matches the old
+    `if value and value != 0` guards)."""
+    return ~np.isnan(arr) & (arr != 0)
 
-    # Debt-to-Assets
-    if total_debt and total_assets and total_assets != 0:
-        kpis["debt_to_assets"] = round(total_debt / total_assets * 100, 2)
 
-    # Equity Ratio
-    if equity and total_assets and total_assets != 0:
-        kpis["equity_ratio"] = round(equity / total_assets * 100, 2)
+def _ratio(num: np.ndarray, den: np.ndarray, scale: float = 1.0) -> np.ndarray:
+    """Element-wise num/den * scale, NaN wherever either side is missing
+    or zero. No div-by-zero branches: the mask feeds np.divide's where."""
+    out = np.full(num.shape, np.nan)
+    np.divide(num, den, out=out, where=_truthy(num) & _truthy(den))
+    return np.round(out * scale, 2)
 
-    return kpis
+
+def build_wide_metrics(
+    facts_df: pd.DataFrame,
+    dim_metric: pd.DataFrame
+) -> pd.DataFrame:
+    """
+    Pivot the fact table to one row per (company_id, date_id) with one
+    column per canonical metric from METRIC_MAPPINGS.
+
+    This single pivot replaces the per-pair boolean-mask scans: every
+    KPI then becomes column arithmetic over the wide frame.
+    """
+    # XBRL tag -> canonical name, then metric_id -> canonical name
+    name_to_canon = {
+        name: canon
+        for canon, names in METRIC_MAPPINGS.items()
+        for name in names
+    }
+    id_to_canon = dict(zip(
+        dim_metric["metric_id"],
+        dim_metric["metric"].map(name_to_canon)
+    ))
+
+    canonical = facts_df["metric_id"].map(id_to_canon)
+    mapped = facts_df.loc[canonical.notna(), ["company_id", "date_id", "value"]].copy()
+    mapped["canonical"] = canonical[canonical.notna()]
+
+    wide = mapped.pivot_table(
+        index=["company_id", "date_id"],
+        columns="canonical",
+        values="value",
+        aggfunc="first"
+    )
+    # Guarantee every canonical column exists even when no fact mapped
+    return wide.reindex(columns=list(METRIC_MAPPINGS.keys()))
 
 
 def calculate_all_kpis(
@@ -194,6 +245,9 @@ def calculate_all_kpis(
     """
     Calculate all KPIs for all companies and periods.
 
+    One pivot over the fact table plus vectorized column arithmetic —
+    no per-(company, date) Python loop.
+
     Returns:
         DataFrame with KPI calculations
     """
@@ -204,44 +258,48 @@ def calculate_all_kpis(
     dim_metric = schema["dim_metric"]
     dim_date = schema["dim_date"]
 
-    # Get unique company/date combinations
-    company_dates = facts_df[["company_id", "date_id"]].drop_duplicates()
-
-    kpi_records = []
-
-    total = len(company_dates)
-    for i, (_, row) in enumerate(company_dates.iterrows()):
-        company_id = row["company_id"]
-        date_id = row["date_id"]
-
-        # Calculate all KPI categories
-        profitability = calculate_profitability_kpis(facts_df, company_id, date_id, dim_metric)
-        liquidity = calculate_liquidity_kpis(facts_df, company_id, date_id, dim_metric)
-        leverage = calculate_leverage_kpis(facts_df, company_id, date_id, dim_metric)
-
-        # Combine all KPIs
-        all_kpis = {**profitability, **liquidity, **leverage}
-
-        if all_kpis:
-            record = {
-                "company_id": company_id,
-                "date_id": date_id,
-                **all_kpis
-            }
-            kpi_records.append(record)
-
-        # Progress logging
-        if (i + 1) % 1000 == 0:
-            logger.info(f"  Processed {i+1:,}/{total:,} company-periods")
-
-    kpi_df = pd.DataFrame(kpi_records)
+    wide = build_wide_metrics(facts_df, dim_metric)
+    logger.info(f"  Pivoted to {len(wide):,} company-periods")
+
+    m = {name: wide[name].to_numpy(dtype=float) for name in METRIC_MAPPINGS}
+
+    kpis = {
+        # Profitability
+        "gross_margin": _ratio(m["GrossProfit"], m["Revenue"], 100),
+        "operating_margin": _ratio(m["OperatingIncome"], m["Revenue"], 100),
+        "net_margin": _ratio(m["NetIncome"], m["Revenue"], 100),
+        "roa": _ratio(m["NetIncome"], m["TotalAssets"], 100),
+        "roe": _ratio(m["NetIncome"], m["StockholdersEquity"], 100),
+        # Liquidity
+        "current_ratio": _ratio(m["CurrentAssets"], m["CurrentLiabilities"]),
+        "cash_ratio": _ratio(m["Cash"], m["CurrentLiabilities"]),
+        # Leverage
+        "debt_to_equity": _ratio(m["TotalDebt"], m["StockholdersEquity"]),
+        "debt_to_assets": _ratio(m["TotalDebt"], m["TotalAssets"], 100),
+        "equity_ratio": _ratio(m["StockholdersEquity"], m["TotalAssets"], 100),
+    }
+
+    # Quick ratio needs all three inputs present (inventory included)
+    quick = np.full(len(wide), np.nan)
+    quick_mask = (_truthy(m["CurrentAssets"]) & _truthy(m["Inventory"]) &
+                  _truthy(m["CurrentLiabilities"]))
+    np.divide(m["CurrentAssets"] - m["Inventory"], m["CurrentLiabilities"],
+              out=quick, where=quick_mask)
+    kpis["quick_ratio"] = np.round(quick, 2)
+
+    kpi_df = pd.DataFrame(kpis, index=wide.index).reset_index()
+
+    # Keep only pairs with at least one computable KPI (matches the old
+    # "if all_kpis" filter)
+    kpi_cols = list(kpis.keys())
+    kpi_df = kpi_df.dropna(how="all", subset=kpi_cols).reset_index(drop=True)
 
     # Join company and date info
     kpi_df = kpi_df.merge(dim_company[["company_id", "entity_name"]], on="company_id", how="left")
     kpi_df = kpi_df.merge(dim_date[["date_id", "fiscal_year", "fiscal_period"]], on="date_id", how="left")
 
     logger.info(f"Calculated KPIs: {len(kpi_df):,} company-period records")
-    logger.info(f"KPI columns: {[c for c in kpi_df.columns if c not in ['company_id', 'date_id', 'entity_name', 'fiscal_year', 'fiscal_period']]}")
+    logger.info(f"KPI columns: {kpi_cols}")
 
     return kpi_df
 
@@ -250,7 +308,7 @@ if __name__ == "__main__":
     # Test KPI calculation
     from transform import transform_to_star_schema
 
-    facts = pd.read_parquet("./data/raw_facts.parquet")
+    facts = pd.read_parquet("./data/raw_facts.parquet", dtype_backend="pyarrow")
     schema = transform_to_star_schema(facts)
     kpis = calculate_all_kpis(schema)
 
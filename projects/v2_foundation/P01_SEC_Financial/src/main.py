@@ -14,6 +14,7 @@ Usage:
 import argparse
 import os
 import sys
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 import pandas as pd
 import logging
@@ -58,13 +59,17 @@ def run_extraction(mode: str, data_dir: str) -> pd.DataFrame:
 
     raw_path = os.path.join(data_dir, "raw_facts.parquet")
 
-    # Check if we already have data
+    # Check if we already have data. The row count lives in the parquet
+    # footer, so read that instead of loading the multi-GB file just to
+    # call len() on it; the data itself is only loaded once the count
+    # passes.
     if os.path.exists(raw_path):
-        existing = pd.read_parquet(raw_path)
-        if len(existing) >= config["min_facts"]:
-            logger.info(f"Using existing data: {len(existing):,} facts")
-            return existing
-        logger.info(f"Existing data ({len(existing):,}) below target, re-extracting...")
+        import pyarrow.parquet as pq
+        existing_rows = pq.ParquetFile(raw_path).metadata.num_rows
+        if existing_rows >= config["min_facts"]:
+            logger.info(f"Using existing data: {existing_rows:,} facts")
+            return pd.read_parquet(raw_path, dtype_backend="pyarrow")
+        logger.info(f"Existing data ({existing_rows:,}) below target, re-extracting...")
 
     facts_df = extract_sec_financial_facts(
         output_path=raw_path,
@@ -86,12 +91,18 @@ def run_transformation(facts_df: pd.DataFrame, output_dir: str) -> dict:
     # Validate
     validation = validate_star_schema(schema)
 
-    # Save schema tables
-    for name, df in schema.items():
+    # Save schema tables concurrently: to_parquet releases the GIL in
+    # the Arrow writer, so the four writes overlap instead of queueing.
+    # zstd also writes ~2x faster than the default snappy codec.
+    def _write(item):
+        name, df = item
         path = os.path.join(output_dir, f"{name}.parquet")
-        df.to_parquet(path, index=False)
+        df.to_parquet(path, index=False, compression="zstd")
         logger.info(f"Saved {name}: {len(df):,} rows -> {path}")
 
+    with ThreadPoolExecutor(max_workers=len(schema)) as executor:
+        list(executor.map(_write, schema.items()))
+
     return schema
 
 
@@ -232,15 +243,20 @@ def main():
 
     # Run pipeline phases
     if args.mode == "report":
-        # Load existing data
-        facts_df = pd.read_parquet(os.path.join(args.data_dir, "raw_facts.parquet"))
+        # Load existing data (Arrow-backed: strings stay in Arrow
+        # buffers instead of per-value Python objects)
+        def _read(directory, name):
+            path = os.path.join(directory, f"{name}.parquet")
+            return pd.read_parquet(path, dtype_backend="pyarrow")
+
+        facts_df = _read(args.data_dir, "raw_facts")
         schema = {
-            "dim_company": pd.read_parquet(os.path.join(args.output_dir, "dim_company.parquet")),
-            "dim_metric": pd.read_parquet(os.path.join(args.output_dir, "dim_metric.parquet")),
-            "dim_date": pd.read_parquet(os.path.join(args.output_dir, "dim_date.parquet")),
-            "fact_financials": pd.read_parquet(os.path.join(args.output_dir, "fact_financials.parquet")),
+            "dim_company": _read(args.output_dir, "dim_company"),
+            "dim_metric": _read(args.output_dir, "dim_metric"),
+            "dim_date": _read(args.output_dir, "dim_date"),
+            "fact_financials": _read(args.output_dir, "fact_financials"),
         }
-        kpis_df = pd.read_parquet(os.path.join(args.output_dir, "kpi_calculations.parquet"))
+        kpis_df = _read(args.output_dir, "kpi_calculations")
     else:
         # Full pipeline
         facts_df = run_extraction(args.mode, args.data_dir)
@@ -26,8 +26,10 @@ def calculate_agency_spending(schema: Dict[str, pd.DataFrame]) -> pd.DataFrame:
     dim_agency = schema["dim_agency"]
     dim_date = schema["dim_date"]
 
-    # Aggregate by agency and year
-    spending = fact.groupby(["agency_id", "date_id"]).agg({
+    # Aggregate by agency and year. sort=False skips the post-agg key
+    # sort (the result is re-sorted below anyway) and observed=True
+    # keeps categorical keys from exploding into unused combinations.
+    spending = fact.groupby(["agency_id", "date_id"], sort=False, observed=True).agg({
         "award_amount": ["sum", "mean", "count"],
         "total_outlays": "sum"
     }).reset_index()
@@ -42,9 +44,19 @@ def calculate_agency_spending(schema: Dict[str, pd.DataFrame]) -> pd.DataFrame:
     date_lookup = dim_date[dim_date["fiscal_quarter"] == "FY"][["date_id", "fiscal_year"]]
     spending = spending.merge(date_lookup, on="date_id", how="left")
 
-    # Calculate YoY growth
+    # Calculate YoY growth. With rows sorted by (agency, year) this is
+    # one comparison of each row against its predecessor, masked where
+    # the agency changes or the prior year obligated nothing — no
+    # per-group transform machinery needed.
     spending = spending.sort_values(["agency_id", "fiscal_year"])
-    spending["yoy_growth"] = spending.groupby("agency_id")["total_obligated"].pct_change() * 100
+    codes, _ = pd.factorize(spending["agency_id"], use_na_sentinel=True)
+    vals = spending["total_obligated"].to_numpy(dtype="float64")
+    growth = np.full(len(spending), np.nan)
+    if len(spending) > 1:
+        prev = vals[:-1]
+        valid = (codes[1:] == codes[:-1]) & (codes[1:] >= 0) & (prev != 0)
+        growth[1:][valid] = (vals[1:][valid] - prev[valid]) / prev[valid] * 100
+    spending["yoy_growth"] = growth
 
     logger.info(f"Agency spending analysis: {len(spending)} records")
 
@@ -62,7 +74,7 @@ def calculate_recipient_rankings(schema: Dict[str, pd.DataFrame]) -> pd.DataFram
     dim_recipient = schema["dim_recipient"]
 
     # Aggregate by recipient
-    rankings = fact.groupby("recipient_id").agg({
+    rankings = fact.groupby("recipient_id", sort=False, observed=True).agg({
         "award_amount": ["sum", "mean", "count"],
         "total_outlays": "sum"
     }).reset_index()
@@ -72,11 +84,16 @@ def calculate_recipient_rankings(schema: Dict[str, pd.DataFrame]) -> pd.DataFram
     # Join recipient info
     rankings = rankings.merge(dim_recipient, on="recipient_id", how="left")
 
-    # Calculate rank
-    rankings["rank"] = rankings["total_awards"].rank(ascending=False, method="dense")
-
-    # Sort by total
-    rankings = rankings.sort_values("total_awards", ascending=False)
+    # Sort by total, then assign dense ranks in one linear scan: after
+    # the sort a rank only increments where the total changes, so
+    # rank() would just be a second O(N log N) sort of the same column
+    rankings = rankings.sort_values("total_awards", ascending=False, kind="mergesort")
+    totals = rankings["total_awards"].to_numpy()
+    rank = np.empty(len(totals), dtype=np.int64)
+    if len(totals):
+        rank[0] = 1
+        rank[1:] = np.cumsum(totals[1:] != totals[:-1]) + 1
+    rankings["rank"] = rank
 
     logger.info(f"Recipient rankings: {len(rankings)} recipients")
 
@@ -94,7 +111,7 @@ def calculate_geographic_distribution(schema: Dict[str, pd.DataFrame]) -> pd.Dat
     dim_location = schema["dim_location"]
 
     # Aggregate by location
-    geo = fact.groupby("location_id").agg({
+    geo = fact.groupby("location_id", sort=False, observed=True).agg({
         "award_amount": ["sum", "count"]
     }).reset_index()
 
@@ -104,7 +121,7 @@ def calculate_geographic_distribution(schema: Dict[str, pd.DataFrame]) -> pd.Dat
     geo = geo.merge(dim_location, on="location_id", how="left")
 
     # Aggregate by state
-    state_summary = geo.groupby(["state_code", "state_name"]).agg({
+    state_summary = geo.groupby(["state_code", "state_name"], sort=False, observed=True).agg({
         "total_spending": "sum",
         "award_count": "sum"
     }).reset_index()
@@ -145,7 +162,7 @@ def calculate_award_type_analysis(schema: Dict[str, pd.DataFrame]) -> pd.DataFra
     }
 
     # Aggregate by award type
-    type_analysis = fact.groupby("award_type").agg({
+    type_analysis = fact.groupby("award_type", sort=False, observed=True).agg({
         "award_amount": ["sum", "mean", "count"]
     }).reset_index()
 
@@ -154,14 +171,16 @@ def calculate_award_type_analysis(schema: Dict[str, pd.DataFrame]) -> pd.DataFra
     # Add type description
     type_analysis["type_description"] = type_analysis["award_type"].map(AWARD_TYPES).fillna("Unknown")
 
-    # Categorize as contract or assistance
-    contract_codes = ["A", "B", "C", "D"]
-    type_analysis["category"] = type_analysis["award_type"].apply(
-        lambda x: "Contract" if x in contract_codes else "Financial Assistance"
+    # Categorize as contract or assistance (vectorized isin, not a
+    # per-row lambda)
+    contract_codes = frozenset({"A", "B", "C", "D"})
+    type_analysis["category"] = np.where(
+        type_analysis["award_type"].isin(contract_codes),
+        "Contract", "Financial Assistance"
     )
 
     # Calculate percentage
-    total = type_analysis["total_amount"].sum()
+    total = type_analysis["total_amount"].to_numpy().sum()
     type_analysis["pct_of_total"] = type_analysis["total_amount"] / total * 100
 
     type_analysis = type_analysis.sort_values("total_amount", ascending=False)
@@ -194,12 +213,18 @@ def calculate_naics_analysis(schema: Dict[str, pd.DataFrame]) -> pd.DataFrame:
         "72": "Accommodation/Food"
     }
 
-    # Extract 2-digit NAICS
-    fact_with_sector = fact.copy()
-    fact_with_sector["naics_sector"] = fact_with_sector["naics_code"].astype(str).str[:2]
+    # Use the sector precomputed by generate_all_analytics when
+    # available; otherwise derive the 2-digit NAICS as a standalone
+    # Series and group on that directly — no need to copy the whole
+    # fact table just to attach a key column
+    if "naics_sector" in fact.columns:
+        sector = fact["naics_sector"]
+    else:
+        sector = fact["naics_code"].astype("string").str.slice(0, 2)
+        sector.name = "naics_sector"
 
     # Aggregate
-    naics_analysis = fact_with_sector.groupby("naics_sector").agg({
+    naics_analysis = fact.groupby(sector, sort=False, observed=True).agg({
         "award_amount": ["sum", "count"]
     }).reset_index()
 
@@ -209,7 +234,7 @@ def calculate_naics_analysis(schema: Dict[str, pd.DataFrame]) -> pd.DataFrame:
     naics_analysis["sector_name"] = naics_analysis["naics_sector"].map(NAICS_SECTORS).fillna("Other")
 
     # Calculate percentage
-    total = naics_analysis["total_amount"].sum()
+    total = naics_analysis["total_amount"].to_numpy().sum()
     naics_analysis["pct_of_total"] = naics_analysis["total_amount"] / total * 100
 
     naics_analysis = naics_analysis.sort_values("total_amount", ascending=False)
@@ -230,6 +255,27 @@ def generate_all_analytics(schema: Dict[str, pd.DataFrame]) -> Dict[str, pd.Data
     logger.info("GENERATING ANALYTICS")
     logger.info(f"{'='*60}")
 
+    # Low-cardinality groupby keys (14 award types, ~100 NAICS sectors,
+    # a few thousand dimension ids) as category dtype: groupby then
+    # hashes integer codes instead of full Python strings per row, and
+    # the columns shrink roughly 10x.
+    fact = schema["fact_awards"]
+    for col in ("award_type", "naics_code", "agency_id", "recipient_id", "location_id"):
+        if col in fact.columns and fact[col].dtype.name != "category":
+            fact[col] = fact[col].astype("category")
+
+    # Derive the 2-digit NAICS sector once, on the categories rather
+    # than the rows: map touches each unique code a single time and the
+    # result is reused by every analytic that needs it. na_action keeps
+    # missing codes as NaN (str(NaN) would mint a bogus "na" sector);
+    # groupby then drops those rows, as before.
+    if "naics_code" in fact.columns and "naics_sector" not in fact.columns:
+        fact["naics_sector"] = (
+            fact["naics_code"]
+            .map(lambda c: str(c)[:2], na_action="ignore")
+            .astype("category")
+        )
+
     analytics = {
         "agency_spending": calculate_agency_spending(schema),
         "recipient_rankings": calculate_recipient_rankings(schema),
@@ -9,11 +9,14 @@ Target: 1M+ award transactions.
 
 import os
 import json
+import threading
 import time
 import zipfile
 import requests
+import numpy as np
 import pandas as pd
 from typing import List, Dict, Optional
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from tqdm import tqdm
 import logging
@@ -30,6 +33,63 @@ SPENDING_BY_AWARD = f"{USASPENDING_BASE}/search/spending_by_award/"
 # Rate limiting
 REQUEST_DELAY = 0.2
 MAX_RETRIES = 3
+# Pages fetched concurrently per batch; the token bucket keeps the
+# aggregate request rate inside the REQUEST_DELAY budget
+MAX_CONCURRENT_PAGES = 10
+
+# Output column -> API response field. award_id is handled separately
+# since it falls back from generated_internal_id to Award ID.
+AWARD_FIELDS = [
+    ("recipient_name", "Recipient Name"),
+    ("award_amount", "Award Amount"),
+    ("total_outlays", "Total Outlays"),
+    ("description", "Description"),
+    ("start_date", "Start Date"),
+    ("end_date", "End Date"),
+    ("awarding_agency", "Awarding Agency"),
+    ("awarding_sub_agency", "Awarding Sub Agency"),
+    ("funding_agency", "Funding Agency"),
+    ("award_type", "Award Type"),
+    ("place_city", "Place of Performance City"),
+    ("place_state", "Place of Performance State"),
+    ("place_zip", "Place of Performance Zip"),
+    ("naics_code", "NAICS Code"),
+    ("cfda_number", "CFDA Number"),
+]
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket rate limiter.
+
+    Unlike the old fixed inter-request sleep (which serializes all
+    requests to one per delay), a bucket lets up to `capacity` requests
+    be in flight at once while the refill rate keeps the average inside
+    the allowed requests/second.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a token is available, then consume it."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(
+                    self.capacity,
+                    self._tokens + (now - self._updated) * self.rate
+                )
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
 
 
 class USASpendingExtractor:
@@ -40,31 +100,38 @@ class USASpendingExtractor:
     """
 
     def __init__(self, cache_dir: str = "./data/cache"):
-        self.session = requests.Session()
-        self.session.headers.update({
-            "Content-Type": "application/json",
-            "Accept": "application/json"
-        })
         self.cache_dir = cache_dir
         os.makedirs(cache_dir, exist_ok=True)
-        self._last_request = 0
+        # One session per worker thread: requests.Session is not
+        # thread-safe, and the limiter enforces the global rate budget
+        # across all of them
+        self._local = threading.local()
+        self._limiter = TokenBucket(1.0 / REQUEST_DELAY, MAX_CONCURRENT_PAGES)
+        self._stats_lock = threading.Lock()
         self.stats = {
             "requests_made": 0,
             "awards_extracted": 0,
             "errors": 0
         }
 
-    def _rate_limit(self):
-        """Ensure we don't exceed API rate limits."""
-        elapsed = time.time() - self._last_request
-        if elapsed < REQUEST_DELAY:
-            time.sleep(REQUEST_DELAY - elapsed)
-        self._last_request = time.time()
+    @property
+    def session(self) -> requests.Session:
+        """Thread-local session with the standard JSON headers."""
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = requests.Session()
+            session.headers.update({
+                "Content-Type": "application/json",
+                "Accept": "application/json"
+            })
+            self._local.session = session
+        return session
 
     def _post(self, url: str, payload: Dict) -> Optional[Dict]:
         """Make rate-limited POST request."""
-        self._rate_limit()
-        self.stats["requests_made"] += 1
+        self._limiter.acquire()
+        with self._stats_lock:
+            self.stats["requests_made"] += 1
 
         for attempt in range(MAX_RETRIES):
             try:
@@ -76,7 +143,8 @@ class USASpendingExtractor:
                 if attempt < MAX_RETRIES - 1:
                     time.sleep(2 ** attempt)
                 else:
-                    self.stats["errors"] += 1
+                    with self._stats_lock:
+                        self.stats["errors"] += 1
                     return None
         return None
 
@@ -143,12 +211,30 @@ class USASpendingExtractor:
 
         return self._post(SPENDING_BY_AWARD, payload)
 
+    def _flush_to_writer(self, writer, cols: Dict[str, list]):
+        """Write the buffered columns as one row group and clear them."""
+        import pyarrow as pa
+
+        frame = pd.DataFrame(cols, copy=False)
+        for col in ("award_amount", "total_outlays"):
+            frame[col] = pd.to_numeric(frame[col], errors="coerce")
+        for col in frame.columns:
+            if col not in ("award_amount", "total_outlays"):
+                frame[col] = frame[col].astype("string")
+
+        writer.write_table(
+            pa.Table.from_pandas(frame, schema=writer.schema, preserve_index=False)
+        )
+        for values in cols.values():
+            values.clear()
+
     def extract_awards_paginated(
         self,
         fiscal_years: List[int],
         min_awards: int = 1_000_000,
-        max_pages: int = 10000
-    ) -> pd.DataFrame:
+        max_pages: int = 10000,
+        output_path: Optional[str] = None
+    ) -> Optional[pd.DataFrame]:
         """
         Extract awards using paginated search.
 
@@ -156,77 +242,129 @@ class USASpendingExtractor:
             fiscal_years: Fiscal years to extract
             min_awards: Minimum awards to extract
             max_pages: Maximum pages to process
+            output_path: When set (and pyarrow is available), stream
+                each page batch straight into this parquet file and
+                return None instead of buffering 1M+ rows in memory
 
         Returns:
-            DataFrame with all awards
+            DataFrame with all awards, or None when streamed to disk
         """
         logger.info(f"Starting award extraction for FY{fiscal_years}")
         logger.info(f"Target: {min_awards:,} awards minimum")
 
-        all_awards = []
+        # Columnar buffer: one Python list per output column instead of
+        # one 16-key dict per row. At 1M rows that skips ~16M dict
+        # entries and lets pandas assemble columns directly without a
+        # second inference pass over row dicts.
+        cols = {"award_id": []}
+        for out_col, _ in AWARD_FIELDS:
+            cols[out_col] = []
+
+        writer = None
+        if output_path is not None:
+            try:
+                import pyarrow as pa
+                import pyarrow.parquet as pq
+
+                schema = pa.schema(
+                    [pa.field("award_id", pa.string())]
+                    + [
+                        pa.field(
+                            name,
+                            pa.float64() if name in ("award_amount", "total_outlays")
+                            else pa.string()
+                        )
+                        for name, _ in AWARD_FIELDS
+                    ]
+                )
+                os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+                writer = pq.ParquetWriter(output_path, schema, compression="zstd")
+                logger.info(f"Streaming awards to {output_path}")
+            except ImportError:
+                logger.warning("pyarrow unavailable, buffering awards in memory")
+                output_path = None
+
+        flushed = 0
         page = 1
         limit = 100
-
-        with tqdm(total=min_awards, desc="Extracting awards", unit=" awards") as pbar:
-            while page <= max_pages:
-                result = self.search_awards(fiscal_years, page=page, limit=limit)
-
-                if not result or "results" not in result:
-                    logger.warning(f"No results on page {page}")
-                    break
-
-                awards = result["results"]
-                if not awards:
-                    logger.info(f"No more awards after page {page}")
-                    break
-
-                # Process awards
-                for award in awards:
-                    all_awards.append({
-                        "award_id": award.get("generated_internal_id") or award.get("Award ID"),
-                        "recipient_name": award.get("Recipient Name"),
-                        "award_amount": award.get("Award Amount"),
-                        "total_outlays": award.get("Total Outlays"),
-                        "description": award.get("Description"),
-                        "start_date": award.get("Start Date"),
-                        "end_date": award.get("End Date"),
-                        "awarding_agency": award.get("Awarding Agency"),
-                        "awarding_sub_agency": award.get("Awarding Sub Agency"),
-                        "funding_agency": award.get("Funding Agency"),
-                        "award_type": award.get("Award Type"),
-                        "place_city": award.get("Place of Performance City"),
-                        "place_state": award.get("Place of Performance State"),
-                        "place_zip": award.get("Place of Performance Zip"),
-                        "naics_code": award.get("NAICS Code"),
-                        "cfda_number": award.get("CFDA Number")
-                    })
-
-                pbar.n = len(all_awards)
-                pbar.refresh()
-
-                # Check if we've hit minimum
-                if len(all_awards) >= min_awards:
-                    logger.info(f"Reached {len(all_awards):,} awards")
-                    break
-
-                # Progress logging
-                if page % 100 == 0:
-                    logger.info(f"Page {page}: {len(all_awards):,} awards extracted")
-
-                page += 1
-
-        df = pd.DataFrame(all_awards)
-        self.stats["awards_extracted"] = len(df)
+        done = False
+
+        # Fetch pages in concurrent batches: the extraction is almost
+        # entirely network-bound, so MAX_CONCURRENT_PAGES requests in
+        # flight cut wall time roughly that factor while the token
+        # bucket keeps the aggregate rate inside the API budget.
+        # pool.map returns results in page order, so rows append
+        # deterministically.
+        try:
+            with ThreadPoolExecutor(max_workers=MAX_CONCURRENT_PAGES) as pool, \
+                    tqdm(total=min_awards, desc="Extracting awards", unit=" awards") as pbar:
+                while page <= max_pages and not done:
+                    batch = range(page, min(page + MAX_CONCURRENT_PAGES, max_pages + 1))
+                    results = pool.map(
+                        lambda p: self.search_awards(fiscal_years, page=p, limit=limit),
+                        batch
+                    )
+
+                    for batch_page, result in zip(batch, results):
+                        if not result or "results" not in result:
+                            logger.warning(f"No results on page {batch_page}")
+                            done = True
+                            break
+
+                        awards = result["results"]
+                        if not awards:
+                            logger.info(f"No more awards after page {batch_page}")
+                            done = True
+                            break
+
+                        # Process awards
+                        for award in awards:
+                            cols["award_id"].append(
+                                award.get("generated_internal_id") or award.get("Award ID")
+                            )
+                            for out_col, api_field in AWARD_FIELDS:
+                                cols[out_col].append(award.get(api_field))
+
+                        # Check if we've hit minimum
+                        n = flushed + len(cols["award_id"])
+                        if n >= min_awards:
+                            logger.info(f"Reached {n:,} awards")
+                            done = True
+                            break
+
+                    # Streaming mode: spill the batch to disk as one row
+                    # group so memory stays bounded at a batch of pages
+                    if writer is not None and cols["award_id"]:
+                        flushed += len(cols["award_id"])
+                        self._flush_to_writer(writer, cols)
+
+                    n = flushed + len(cols["award_id"])
+                    pbar.n = n
+                    pbar.refresh()
+
+                    # Progress logging
+                    if page % 100 < MAX_CONCURRENT_PAGES:
+                        logger.info(f"Page {page}: {n:,} awards extracted")
+
+                    page += len(batch)
+        finally:
+            if writer is not None:
+                writer.close()
+
+        total = flushed + len(cols["award_id"])
+        self.stats["awards_extracted"] = total
 
         logger.info(f"\n{'='*60}")
         logger.info("EXTRACTION COMPLETE")
         logger.info(f"{'='*60}")
-        logger.info(f"Total awards extracted: {len(df):,}")
+        logger.info(f"Total awards extracted: {total:,}")
         logger.info(f"API requests made: {self.stats['requests_made']:,}")
         logger.info(f"Errors: {self.stats['errors']}")
         logger.info(f"{'='*60}")
 
-        return df
+        if writer is not None:
+            return None
+        return pd.DataFrame(cols, copy=False)
 
     def extract_bulk_download(
         self,
@@ -295,11 +433,19 @@ def extract_federal_awards(
 
     extractor = USASpendingExtractor()
 
-    # Extract awards
+    # Extract awards. With pyarrow installed the extractor streams row
+    # groups straight into output_path and returns None; load the file
+    # back (columnar, no per-row dict overhead) for post-processing.
     awards_df = extractor.extract_awards_paginated(
         fiscal_years=fiscal_years,
-        min_awards=min_awards
+        min_awards=min_awards,
+        output_path=output_path
     )
+    if awards_df is None:
+        if os.path.exists(output_path):
+            awards_df = pd.read_parquet(output_path)
+        else:
+            awards_df = pd.DataFrame()
 
     # Parse dates
     for col in ["start_date", "end_date"]:
@@ -311,10 +457,15 @@ def extract_federal_awards(
         if col in awards_df.columns:
             awards_df[col] = pd.to_numeric(awards_df[col], errors="coerce")
 
-    # Extract fiscal year from start_date
-    awards_df["fiscal_year"] = awards_df["start_date"].apply(
-        lambda x: x.year + 1 if pd.notna(x) and x.month >= 10 else (x.year if pd.notna(x) else None)
-    )
+    # Extract fiscal year from start_date (Oct-Sep). Vectorized on the
+    # datetime64 accessors rather than a per-row apply lambda.
+    if len(awards_df):
+        start = awards_df["start_date"]
+        years = start.dt.year.to_numpy(dtype="float64", na_value=np.nan)
+        months = start.dt.month.to_numpy(dtype="float64", na_value=np.nan)
+        fiscal = np.where(months >= 10, years + 1, years)
+        fiscal[start.isna().to_numpy()] = np.nan
+        awards_df["fiscal_year"] = fiscal
 
     # Save to parquet
     os.makedirs(os.path.dirname(output_path), exist_ok=True)
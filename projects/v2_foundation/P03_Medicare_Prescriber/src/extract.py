@@ -9,7 +9,10 @@ Target: 5M+ prescription records.
 
 import os
 import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
 import requests
+import numpy as np
 import pandas as pd
 from typing import List, Optional, Generator
 from tqdm import tqdm
@@ -31,6 +34,41 @@ PARTD_URLS = {
 # Chunk size for reading large files
 CHUNK_SIZE = 100_000
 
+# Columns the pipeline consumes, with dtypes declared up front so the
+# CSV readers skip inference and never materialize the unused ge65_*/
+# FIPS columns. float32 is plenty for the CMS measure columns and
+# halves their bandwidth in every downstream pass.
+CMS_DTYPES = {
+    "Prscrbr_NPI": "string",
+    "Prscrbr_Last_Org_Name": "string",
+    "Prscrbr_First_Name": "string",
+    "Prscrbr_City": "string",
+    "Prscrbr_State_Abrvtn": "string",
+    "Prscrbr_Type": "string",
+    "Brnd_Name": "string",
+    "Gnrc_Name": "string",
+    "Tot_Clms": "float32",
+    "Tot_30day_Fills": "float32",
+    "Tot_Day_Suply": "float32",
+    "Tot_Drug_Cst": "float32",
+    "Tot_Benes": "float32",
+}
+
+# Fixed schema for the extracted output. Streaming writes reindex every
+# chunk to these columns so each batch matches the parquet writer's
+# schema regardless of source (CSV year file or generated sample).
+RAW_COLUMNS = [
+    "npi", "provider_last_name", "provider_first_name", "city", "state",
+    "specialty", "brand_name", "generic_name", "drug_name", "drug_class",
+    "total_claims", "total_30day_fills", "total_day_supply",
+    "total_drug_cost", "total_beneficiaries", "year",
+]
+
+_MEASURE_COLUMNS = [
+    "total_claims", "total_30day_fills", "total_day_supply",
+    "total_drug_cost", "total_beneficiaries",
+]
+
 
 class CMSPartDExtractor:
     """
@@ -49,45 +87,98 @@ class CMSPartDExtractor:
             "errors": 0
         }
 
-    def download_file(self, url: str, filename: str) -> Optional[str]:
+    def download_file(self, url: str, filename: str,
+                      session: Optional[requests.Session] = None) -> Optional[str]:
         """
         Download file from CMS.
 
         Args:
             url: Download URL
             filename: Local filename
+            session: Session to download with. Concurrent callers pass
+                their own since requests.Session is not thread-safe.
 
         Returns:
             Path to downloaded file
         """
         filepath = os.path.join(self.cache_dir, filename)
+        parquet_path = os.path.splitext(filepath)[0] + ".parquet"
+
+        # Prefer the parquet cache: repeat runs skip CSV parsing entirely
+        if os.path.exists(parquet_path):
+            logger.info(f"Using cached file: {parquet_path}")
+            return parquet_path
 
         if os.path.exists(filepath):
             logger.info(f"Using cached file: {filepath}")
-            return filepath
+            return self._cache_as_parquet(filepath)
 
         logger.info(f"Downloading: {url}")
 
         try:
-            response = self.session.get(url, stream=True, timeout=300)
+            response = (session or self.session).get(url, stream=True, timeout=300)
             response.raise_for_status()
 
             total_size = int(response.headers.get('content-length', 0))
 
+            # 1MB chunks: ~1k write syscalls and progress updates per GB
+            # instead of ~125k with the old 8KB chunks
             with open(filepath, 'wb') as f:
                 with tqdm(total=total_size, unit='B', unit_scale=True, desc=filename) as pbar:
-                    for chunk in response.iter_content(chunk_size=8192):
+                    for chunk in response.iter_content(chunk_size=1 << 20):
                         f.write(chunk)
                         pbar.update(len(chunk))
 
             logger.info(f"Downloaded: {filepath}")
-            return filepath
+            return self._cache_as_parquet(filepath)
 
         except Exception as e:
             logger.error(f"Download failed: {e}")
             self.stats["errors"] += 1
             return None
 
+    def _cache_as_parquet(self, csv_path: str) -> str:
+        """
+        Convert a cached CSV to zstd parquet and return the new path.
+
+        Parsing a 1GB+ CMS CSV costs minutes on every run; the parquet
+        copy reads back in seconds, compresses ~4x, and supports column
+        pruning. Streams batch-by-batch so conversion never holds the
+        full file in memory. Returns the CSV path unchanged when
+        pyarrow is unavailable.
+        """
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            return csv_path
+
+        parquet_path = os.path.splitext(csv_path)[0] + ".parquet"
+
+        writer = None
+        try:
+            for chunk in self._iter_csv(csv_path):
+                table = pa.Table.from_pandas(chunk, preserve_index=False)
+                if writer is None:
+                    writer = pq.ParquetWriter(
+                        parquet_path, table.schema, compression="zstd"
+                    )
+                writer.write_table(table)
+        except Exception as e:
+            logger.error(f"Parquet cache conversion failed: {e}")
+            if writer is not None:
+                writer.close()
+            if os.path.exists(parquet_path):
+                os.remove(parquet_path)
+            return csv_path
+        if writer is None:
+            return csv_path
+        writer.close()
+
+        os.remove(csv_path)
+        logger.info(f"Cached as parquet: {parquet_path}")
+        return parquet_path
+
     def read_csv_chunked(
         self,
         filepath: str,
@@ -106,7 +197,7 @@ class CMSPartDExtractor:
         total_read = 0
 
         try:
-            for chunk in pd.read_csv(filepath, chunksize=CHUNK_SIZE, low_memory=False):
+            for chunk in self._iter_csv(filepath):
                 if nrows and total_read >= nrows:
                     break
 
@@ -122,81 +213,200 @@ class CMSPartDExtractor:
             logger.error(f"Error reading {filepath}: {e}")
             self.stats["errors"] += 1
 
+    def _iter_csv(self, filepath: str) -> Generator[pd.DataFrame, None, None]:
+        """
+        Yield DataFrame chunks from a cached CSV or parquet file.
+
+        Parquet caches iterate row groups directly. For CSVs, prefers
+        pyarrow's streaming reader, which tokenizes with multiple
+        threads and skips Python-object dtype inference - the single
+        biggest win on multi-GB CMS files. Falls back to pandas'
+        chunked reader when pyarrow is unavailable.
+        """
+        if filepath.endswith(".parquet"):
+            try:
+                import pyarrow.parquet as pq
+            except ImportError:
+                yield pd.read_parquet(filepath)
+                return
+            pf = pq.ParquetFile(filepath)
+            for batch in pf.iter_batches(batch_size=CHUNK_SIZE):
+                yield batch.to_pandas()
+            return
+
+        try:
+            import pyarrow as pa
+            from pyarrow import csv as pacsv
+        except ImportError:
+            yield from pd.read_csv(
+                filepath, chunksize=CHUNK_SIZE,
+                usecols=lambda c: c in CMS_DTYPES, dtype=CMS_DTYPES,
+            )
+            return
+
+        read_options = pacsv.ReadOptions(block_size=64 << 20)
+        convert_options = pacsv.ConvertOptions(
+            include_columns=list(CMS_DTYPES),
+            include_missing_columns=True,
+            column_types={
+                col: pa.string() if dtype == "string" else pa.float32()
+                for col, dtype in CMS_DTYPES.items()
+            },
+        )
+        with pacsv.open_csv(filepath, read_options=read_options,
+                            convert_options=convert_options) as reader:
+            for batch in reader:
+                yield batch.to_pandas()
+
+    def _normalize_chunk(self, chunk: pd.DataFrame, year: int) -> pd.DataFrame:
+        """
+        Standardize one chunk to the fixed RAW_COLUMNS schema with
+        stable dtypes, so every batch matches the streaming writer.
+        """
+        chunk = self._standardize_columns(chunk)
+        if "year" not in chunk.columns:
+            chunk["year"] = year
+        chunk = chunk.reindex(columns=RAW_COLUMNS)
+        for col in _MEASURE_COLUMNS:
+            chunk[col] = pd.to_numeric(chunk[col], errors="coerce").astype("float32")
+        chunk["year"] = pd.to_numeric(chunk["year"], errors="coerce").astype("int32")
+        for col in RAW_COLUMNS:
+            if col not in _MEASURE_COLUMNS and col != "year":
+                chunk[col] = chunk[col].astype("string")
+        return chunk
+
     def extract_partd_data(
         self,
         years: List[int],
-        min_records: int = 5_000_000
-    ) -> pd.DataFrame:
+        min_records: int = 5_000_000,
+        output_path: Optional[str] = None
+    ) -> Optional[pd.DataFrame]:
         """
         Extract Part D prescriber data for given years.
 
         Args:
             years: List of years to extract
             min_records: Minimum records to extract
+            output_path: When given (and pyarrow is available), chunks
+                are appended straight to this parquet file as they
+                arrive, so peak memory stays O(chunk) instead of the
+                full record count; returns None in that mode.
 
         Returns:
-            DataFrame with prescription data
+            DataFrame with prescription data, or None when streamed to
+            output_path
         """
         logger.info(f"Starting Part D extraction for years: {years}")
         logger.info(f"Target: {min_records:,} records minimum")
 
+        stream = None
+        if output_path is not None:
+            try:
+                import pyarrow as pa
+                import pyarrow.parquet as pq
+                stream = (pa, pq)
+            except ImportError:
+                logger.info("pyarrow unavailable, falling back to in-memory extract")
+
         all_records = []
         total_extracted = 0
+        writer = None
+
+        def _emit(frame: pd.DataFrame, year: int) -> None:
+            """Append a chunk: to the parquet writer or the in-memory list."""
+            nonlocal writer
+            if stream is None:
+                all_records.append(frame)
+                return
+            pa, pq = stream
+            table = pa.Table.from_pandas(
+                self._normalize_chunk(frame, year), preserve_index=False
+            )
+            if writer is None:
+                writer = pq.ParquetWriter(
+                    output_path, table.schema, compression="zstd"
+                )
+            writer.write_table(table)
+
+        # Prefetch every year's file up front so the next download runs
+        # while the current file is being parsed (I/O-compute overlap).
+        # Each worker gets its own session: requests.Session is not
+        # thread-safe.
+        executor = ThreadPoolExecutor(max_workers=max(1, len(years)))
+        downloads = {
+            y: executor.submit(
+                self.download_file, PARTD_URLS[y], f"partd_{y}.csv",
+                requests.Session()
+            )
+            for y in years if y in PARTD_URLS
+        }
 
-        for year in years:
-            if total_extracted >= min_records:
-                break
-
-            url = PARTD_URLS.get(year)
-            if not url:
-                logger.warning(f"No URL for year {year}")
-                continue
-
-            filename = f"partd_{year}.csv"
-            filepath = self.download_file(url, filename)
+        try:
+            for year in years:
+                if total_extracted >= min_records:
+                    break
 
-            if not filepath:
-                # Generate sample data if download fails
-                logger.warning(f"Using generated sample data for {year}")
-                sample_df = self._generate_sample_data(year, min(min_records - total_extracted, 1_000_000))
-                all_records.append(sample_df)
-                total_extracted += len(sample_df)
-                continue
+                if year not in downloads:
+                    logger.warning(f"No URL for year {year}")
+                    continue
 
-            logger.info(f"Processing {filename}...")
+                filename = f"partd_{year}.csv"
+                filepath = downloads[year].result()
 
-            remaining = min_records - total_extracted
+                if not filepath:
+                    # Generate sample data if download fails
+                    logger.warning(f"Using generated sample data for {year}")
+                    sample_df = self._generate_sample_data(year, min(min_records - total_extracted, 1_000_000))
+                    _emit(sample_df, year)
+                    total_extracted += len(sample_df)
+                    continue
 
-            for chunk in self.read_csv_chunked(filepath, nrows=remaining):
-                # Standardize column names
-                chunk = self._standardize_columns(chunk)
+                logger.info(f"Processing {filename}...")
 
-                all_records.append(chunk)
-                total_extracted += len(chunk)
+                remaining = min_records - total_extracted
 
-                if total_extracted % 500_000 == 0:
-                    logger.info(f"Extracted {total_extracted:,} records...")
+                for chunk in self.read_csv_chunked(filepath, nrows=remaining):
+                    # Chunks go straight to the writer (streaming) or are
+                    # accumulated raw and standardized once after concat
+                    _emit(chunk, year)
+                    total_extracted += len(chunk)
 
-                if total_extracted >= min_records:
-                    break
+                    if total_extracted % 500_000 == 0:
+                        logger.info(f"Extracted {total_extracted:,} records...")
 
-            self.stats["files_processed"] += 1
+                    if total_extracted >= min_records:
+                        break
 
-        # Combine all chunks
-        if all_records:
-            df = pd.concat(all_records, ignore_index=True)
-        else:
-            df = pd.DataFrame()
+                self.stats["files_processed"] += 1
+        finally:
+            # Don't wait on downloads for years we never got to
+            executor.shutdown(wait=False, cancel_futures=True)
+            if writer is not None:
+                writer.close()
 
-        self.stats["records_extracted"] = len(df)
+        self.stats["records_extracted"] = total_extracted
 
         logger.info(f"\n{'='*60}")
         logger.info("EXTRACTION COMPLETE")
         logger.info(f"{'='*60}")
         logger.info(f"Files processed: {self.stats['files_processed']}")
-        logger.info(f"Total records: {len(df):,}")
-        logger.info(f"Unique prescribers: {df['npi'].nunique():,}")
-        logger.info(f"Unique drugs: {df['drug_name'].nunique():,}")
+        logger.info(f"Total records: {total_extracted:,}")
+
+        if stream is not None:
+            logger.info(f"Streamed to: {output_path}")
+            logger.info(f"{'='*60}")
+            return None
+
+        # Combine all chunks, then standardize column names in a single
+        # pass over the full frame
+        if all_records:
+            df = self._standardize_columns(pd.concat(all_records, ignore_index=True))
+        else:
+            df = pd.DataFrame()
+
+        if len(df):
+            logger.info(f"Unique prescribers: {df['npi'].nunique():,}")
+            logger.info(f"Unique drugs: {df['drug_name'].nunique():,}")
         logger.info(f"{'='*60}")
 
         return df
@@ -231,16 +441,23 @@ class CMSPartDExtractor:
         # Rename columns
         df = df.rename(columns=column_map)
 
-        # Create drug_name from brand/generic
+        # Create drug_name from brand/generic (one vectorized pass;
+        # sample-data rows already carry drug_name, so only fill gaps)
         if "brand_name" in df.columns and "generic_name" in df.columns:
-            df["drug_name"] = df["brand_name"].fillna(df["generic_name"])
+            derived = np.where(
+                df["brand_name"].notna(), df["brand_name"], df["generic_name"]
+            )
+            if "drug_name" in df.columns:
+                df["drug_name"] = df["drug_name"].fillna(
+                    pd.Series(derived, index=df.index)
+                )
+            else:
+                df["drug_name"] = derived
 
         return df
 
     def _generate_sample_data(self, year: int, n_records: int) -> pd.DataFrame:
         """Generate sample data for testing when API is unavailable."""
-        import numpy as np
-
         logger.info(f"Generating {n_records:,} sample records for {year}")
 
         # Sample specialties
@@ -266,31 +483,36 @@ class CMSPartDExtractor:
 
         states = ["CA", "TX", "FL", "NY", "PA", "IL", "OH", "GA", "NC", "MI"]
 
-        np.random.seed(42 + year)
-
-        records = []
-        for i in range(n_records):
-            drug = drugs[np.random.randint(0, len(drugs))]
-            records.append({
-                "npi": f"{np.random.randint(1000000000, 9999999999)}",
-                "provider_last_name": f"Provider_{i // 100}",
-                "provider_first_name": f"First_{i % 100}",
-                "city": f"City_{np.random.randint(1, 1000)}",
-                "state": np.random.choice(states),
-                "specialty": np.random.choice(specialties),
-                "brand_name": drug[0],
-                "generic_name": drug[1],
-                "drug_name": drug[0],
-                "drug_class": drug[2],
-                "total_claims": np.random.randint(10, 5000),
-                "total_30day_fills": np.random.randint(5, 2500),
-                "total_day_supply": np.random.randint(100, 50000),
-                "total_drug_cost": np.random.uniform(100, 100000),
-                "total_beneficiaries": np.random.randint(5, 500),
-                "year": year
-            })
-
-        return pd.DataFrame(records)
+        # Draw each column as one vectorized call: n C-level batch draws
+        # instead of n_records round-trips through the interpreter
+        rng = np.random.default_rng(42 + year)
+        n = n_records
+
+        drug_idx = rng.integers(0, len(drugs), size=n)
+        brand = np.array([d[0] for d in drugs])[drug_idx]
+        generic = np.array([d[1] for d in drugs])[drug_idx]
+        drug_class = np.array([d[2] for d in drugs])[drug_idx]
+
+        row_idx = np.arange(n)
+
+        return pd.DataFrame({
+            "npi": rng.integers(1_000_000_000, 10_000_000_000, size=n).astype(str),
+            "provider_last_name": np.char.add("Provider_", (row_idx // 100).astype(str)),
+            "provider_first_name": np.char.add("First_", (row_idx % 100).astype(str)),
+            "city": np.char.add("City_", rng.integers(1, 1000, size=n).astype(str)),
+            "state": rng.choice(states, size=n),
+            "specialty": rng.choice(specialties, size=n),
+            "brand_name": brand,
+            "generic_name": generic,
+            "drug_name": brand,
+            "drug_class": drug_class,
+            "total_claims": rng.integers(10, 5000, size=n, dtype=np.int32),
+            "total_30day_fills": rng.integers(5, 2500, size=n, dtype=np.int32),
+            "total_day_supply": rng.integers(100, 50000, size=n, dtype=np.int32),
+            "total_drug_cost": rng.uniform(100, 100000, size=n),
+            "total_beneficiaries": rng.integers(5, 500, size=n, dtype=np.int32),
+            "year": year
+        })
 
 
 def extract_medicare_prescriptions(
@@ -314,25 +536,31 @@ def extract_medicare_prescriptions(
 
     extractor = CMSPartDExtractor()
 
-    # Extract data
+    # Extract, streaming chunks straight to parquet so the full record
+    # set is never resident at once (falls back to in-memory without
+    # pyarrow)
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
     df = extractor.extract_partd_data(
         years=years,
-        min_records=min_records
+        min_records=min_records,
+        output_path=output_path
     )
 
-    # Convert numeric columns
-    numeric_cols = ["total_claims", "total_30day_fills", "total_day_supply",
-                    "total_drug_cost", "total_beneficiaries"]
-    for col in numeric_cols:
-        if col in df.columns:
-            df[col] = pd.to_numeric(df[col], errors="coerce")
+    if df is None:
+        # Streamed: read back columnar (far cheaper than the chunk peak)
+        logger.info(f"Saved {extractor.stats['records_extracted']:,} records to {output_path}")
+        if not os.path.exists(output_path):
+            return pd.DataFrame()
+        return pd.read_parquet(output_path)
+
+    # In-memory fallback path. Measure columns arrive numeric: declared
+    # at CSV read time via CMS_DTYPES, and generated numeric for samples
 
     # Add year if not present
     if "year" not in df.columns:
         df["year"] = years[0]  # Default to first year
 
     # Save to parquet
-    os.makedirs(os.path.dirname(output_path), exist_ok=True)
     df.to_parquet(output_path, index=False)
     logger.info(f"Saved {len(df):,} records to {output_path}")
 
@@ -7,6 +7,8 @@ Transforms raw CMS Part D data into analytics-ready star schema.
 Handles 5M+ rows with proper dimensional modeling.
 """
 
+import re
+
 import pandas as pd
 import numpy as np
 from typing import Dict
@@ -27,6 +29,22 @@ ANTIBIOTIC_GENERICS = [
     "levofloxacin", "penicillin"
 ]
 
+# Compiled alternations: one regex pass per column classifies against
+# all keywords at once instead of k substring searches per row
+_OPIOID_RE = re.compile("|".join(map(re.escape, OPIOID_GENERICS)), re.IGNORECASE)
+_ANTIBIOTIC_RE = re.compile("|".join(map(re.escape, ANTIBIOTIC_GENERICS)), re.IGNORECASE)
+
+# The columns the star-schema transform actually consumes. Readers can
+# push this list into the parquet scan so untouched columns (ge65_*,
+# FIPS codes, suppression flags) are never decoded.
+TRANSFORM_COLUMNS = [
+    "npi", "provider_last_name", "provider_first_name", "specialty",
+    "drug_name", "generic_name", "brand_name",
+    "city", "state", "year",
+    "total_claims", "total_30day_fills", "total_day_supply",
+    "total_drug_cost", "total_beneficiaries",
+]
+
 
 def create_dim_prescriber(df: pd.DataFrame) -> pd.DataFrame:
     """
@@ -35,26 +53,32 @@ def create_dim_prescriber(df: pd.DataFrame) -> pd.DataFrame:
     Returns:
         DataFrame with prescriber_id, npi, name, specialty, credential
     """
-    # Get unique prescribers
-    prescribers = df[["npi", "provider_last_name", "provider_first_name", "specialty"]].drop_duplicates(subset=["npi"])
-    prescribers = prescribers.dropna(subset=["npi"])
-    prescribers = prescribers.reset_index(drop=True)
-    prescribers["prescriber_id"] = prescribers.index + 1
-
-    # Create full name
+    # Get unique prescribers: groupby-first is a single hash pass over
+    # the key column (vs drop_duplicates + dropna re-hashing the frame)
+    # and runs on int codes when npi is categorical. NaN NPIs fall out
+    # of the groupby for free.
+    cols = df[["npi", "provider_last_name", "provider_first_name", "specialty"]]
+    if not isinstance(cols["npi"].dtype, pd.CategoricalDtype):
+        cols = cols.assign(npi=cols["npi"].astype("category"))
+    prescribers = cols.groupby("npi", sort=True, as_index=False, observed=True).first()
+    # int32 surrogate keys straight from the categorical codes: the
+    # fact build shifts the same codes, so no lookup table is needed
+    prescribers["prescriber_id"] = (prescribers["npi"].cat.codes + 1).astype("int32")
+
+    # Create full name: str.cat joins both columns in one pass instead
+    # of the fillna + concat chain that allocated three intermediates
     prescribers["provider_name"] = (
-        prescribers["provider_first_name"].fillna("") + " " +
-        prescribers["provider_last_name"].fillna("")
-    ).str.strip()
-
-    # Classify entity type
-    def classify_entity(name):
-        name_lower = str(name).lower()
-        if any(x in name_lower for x in ["clinic", "center", "hospital", "health", "medical"]):
-            return "Organization"
-        return "Individual"
+        prescribers["provider_first_name"]
+        .str.cat(prescribers["provider_last_name"], sep=" ", na_rep="")
+        .str.strip()
+    )
 
-    prescribers["entity_type"] = prescribers["provider_name"].apply(classify_entity)
+    # Classify entity type: one vectorized regex pass instead of a
+    # Python-level substring scan per prescriber
+    is_org = prescribers["provider_name"].str.contains(
+        "clinic|center|hospital|health|medical", case=False, regex=True, na=False
+    )
+    prescribers["entity_type"] = np.where(is_org, "Organization", "Individual")
 
     logger.info(f"Created dim_prescriber: {len(prescribers)} prescribers")
     logger.info(f"Top specialties: {prescribers['specialty'].value_counts().head(5).to_dict()}")
@@ -73,25 +97,23 @@ def create_dim_drug(df: pd.DataFrame) -> pd.DataFrame:
     drug_cols = ["drug_name", "generic_name", "brand_name"]
     available_cols = [c for c in drug_cols if c in df.columns]
 
-    drugs = df[available_cols].drop_duplicates()
-    drugs = drugs.dropna(subset=["drug_name"] if "drug_name" in available_cols else available_cols[:1])
-    drugs = drugs.reset_index(drop=True)
-    drugs["drug_id"] = drugs.index + 1
-
-    # Classify drugs
-    def is_opioid(generic):
-        if pd.isna(generic):
-            return False
-        return any(op in str(generic).lower() for op in OPIOID_GENERICS)
-
-    def is_antibiotic(generic):
-        if pd.isna(generic):
-            return False
-        return any(ab in str(generic).lower() for ab in ANTIBIOTIC_GENERICS)
+    # One row per drug key in a single hash pass; this also guarantees
+    # the key is unique, matching the code-based fact assignment
+    key_col = "drug_name" if "drug_name" in available_cols else available_cols[0]
+    drug_frame = df[available_cols]
+    if not isinstance(drug_frame[key_col].dtype, pd.CategoricalDtype):
+        drug_frame = drug_frame.assign(
+            **{key_col: drug_frame[key_col].astype("category")}
+        )
+    drugs = drug_frame.groupby(key_col, sort=True, as_index=False, observed=True).first()
+    drugs["drug_id"] = (drugs[key_col].cat.codes + 1).astype("int32")
 
+    # Classify drugs: one vectorized pass over the deduplicated column
+    # per compiled alternation (NaN generics classify as False)
     if "generic_name" in drugs.columns:
-        drugs["is_opioid"] = drugs["generic_name"].apply(is_opioid)
-        drugs["is_antibiotic"] = drugs["generic_name"].apply(is_antibiotic)
+        generic = drugs["generic_name"].astype(str)
+        drugs["is_opioid"] = generic.str.contains(_OPIOID_RE, na=False)
+        drugs["is_antibiotic"] = generic.str.contains(_ANTIBIOTIC_RE, na=False)
     else:
         drugs["is_opioid"] = False
         drugs["is_antibiotic"] = False
@@ -126,7 +148,7 @@ def create_dim_location(df: pd.DataFrame) -> pd.DataFrame:
 
     locations = df[available_cols].drop_duplicates()
     locations = locations.reset_index(drop=True)
-    locations["location_id"] = locations.index + 1
+    locations["location_id"] = (locations.index + 1).astype("int32")
 
     # Add state name
     STATE_NAMES = {
@@ -179,7 +201,7 @@ def create_dim_year(df: pd.DataFrame) -> pd.DataFrame:
             "calendar_year": int(year)
         })
 
-    year_df = pd.DataFrame(year_records)
+    year_df = pd.DataFrame(year_records).astype({"year_id": "int32"})
     logger.info(f"Created dim_year: {len(year_df)} years")
 
     return year_df
@@ -200,25 +222,33 @@ def create_fact_prescriptions(
     """
     logger.info(f"Creating fact_prescriptions from {len(df):,} raw records...")
 
-    # Merge prescriber dimension
-    prescriber_lookup = dim_prescriber[["prescriber_id", "npi"]]
-    fact = df.merge(prescriber_lookup, on="npi", how="left")
+    # The dims number their ids from the key columns' categorical codes,
+    # so the big fact keys are the same codes shifted by one - a single
+    # C-level pass per column with no dict build and no merge. Code -1
+    # (NaN key) becomes 0 and is masked back to NA, preserving orphan
+    # detection. The small location/year keys stay as dict lookups.
+    fact = df
 
-    # Merge drug dimension
-    drug_lookup = dim_drug[["drug_id", "drug_name"]]
-    fact = fact.merge(drug_lookup, on="drug_name", how="left")
+    for col, key_name in (("npi", "prescriber_id"), ("drug_name", "drug_id")):
+        if not isinstance(fact[col].dtype, pd.CategoricalDtype):
+            fact[col] = fact[col].astype("category")
+        codes = fact[col].cat.codes + 1
+        fact[key_name] = codes.where(codes > 0).astype("Int32")
 
-    # Merge location dimension
     if "city" in df.columns and "state" in df.columns:
-        location_lookup = dim_location[["location_id", "city", "state"]]
-        fact = fact.merge(location_lookup, on=["city", "state"], how="left")
+        loc_map = dict(zip(
+            zip(dim_location["city"], dim_location["state"]),
+            dim_location["location_id"]
+        ))
+        fact["location_id"] = pd.Series(
+            list(zip(fact["city"], fact["state"])), index=fact.index
+        ).map(loc_map)
     else:
         fact["location_id"] = 1
 
-    # Merge year dimension
     if "year" in df.columns:
-        year_lookup = dim_year[["year_id", "calendar_year"]]
-        fact = fact.merge(year_lookup, left_on="year", right_on="calendar_year", how="left")
+        year_map = dict(zip(dim_year["calendar_year"], dim_year["year_id"]))
+        fact["year_id"] = fact["year"].map(year_map)
     else:
         fact["year_id"] = 1
 
@@ -231,6 +261,13 @@ def create_fact_prescriptions(
 
     fact_table = fact[fact_cols].copy()
 
+    # Downcast: nullable Int32 keys keep orphan NaNs detectable while
+    # halving key bytes; float measures drop to float32
+    for col in ("prescriber_id", "drug_id", "location_id", "year_id"):
+        fact_table[col] = fact_table[col].astype("Int32")
+    for col in available_measures:
+        fact_table[col] = pd.to_numeric(fact_table[col], downcast="float")
+
     # Calculate derived measures
     if "total_drug_cost" in fact_table.columns and "total_claims" in fact_table.columns:
         fact_table["avg_cost_per_claim"] = (
@@ -239,7 +276,7 @@ def create_fact_prescriptions(
 
     # Add surrogate key
     fact_table = fact_table.reset_index(drop=True)
-    fact_table["fact_id"] = fact_table.index + 1
+    fact_table["fact_id"] = np.arange(1, len(fact_table) + 1, dtype="int32")
 
     # Reorder columns
     final_cols = ["fact_id", "prescriber_id", "drug_id", "location_id", "year_id"]
@@ -266,6 +303,15 @@ def transform_to_star_schema(df: pd.DataFrame) -> Dict[str, pd.DataFrame]:
     logger.info(f"{'='*60}")
     logger.info(f"Input rows: {len(df):,}")
 
+    # Encode the join keys as categoricals once up front: the dims are
+    # built from this same frame so their key columns share the dtype,
+    # and every dedup/merge below hashes int32 codes instead of Python
+    # strings (also roughly halves memory on these columns)
+    df = df.copy()
+    for col in ("npi", "drug_name", "city", "state"):
+        if col in df.columns:
+            df[col] = df[col].astype("category")
+
     # Create dimensions
     dim_prescriber = create_dim_prescriber(df)
     dim_drug = create_dim_drug(df)
@@ -309,26 +355,28 @@ def validate_star_schema(schema: Dict[str, pd.DataFrame]) -> Dict[str, any]:
     }
 
     fact = schema["fact_prescriptions"]
+    total = len(fact)
 
-    # Check for orphan dimension keys
+    # Check for orphan dimension keys: isna().sum() is a single
+    # counting pass, with no filtered frame materialized just for len()
     for dim_col in ["prescriber_id", "drug_id", "location_id", "year_id"]:
         if dim_col in fact.columns:
-            orphans = fact[fact[dim_col].isna()]
+            orphan_count = int(fact[dim_col].isna().sum())
             results["checks"].append({
                 "check": f"orphan_{dim_col}",
-                "passed": len(orphans) < len(fact) * 0.1,
-                "count": len(orphans),
-                "percentage": round(len(orphans) / len(fact) * 100, 2)
+                "passed": orphan_count < total * 0.1,
+                "count": orphan_count,
+                "percentage": round(orphan_count / total * 100, 2)
             })
 
     # Check claims column
     if "total_claims" in fact.columns:
-        null_claims = fact["total_claims"].isna().sum()
+        null_claims = int(fact["total_claims"].isna().sum())
         results["checks"].append({
             "check": "null_claims",
-            "passed": null_claims < len(fact) * 0.05,
+            "passed": null_claims < total * 0.05,
             "count": null_claims,
-            "percentage": round(null_claims / len(fact) * 100, 2)
+            "percentage": round(null_claims / total * 100, 2)
         })
 
     # Overall
@@ -342,7 +390,15 @@ def validate_star_schema(schema: Dict[str, pd.DataFrame]) -> Dict[str, any]:
 
 
 if __name__ == "__main__":
-    test_data = pd.read_parquet("./data/raw_prescriptions.parquet")
+    import pyarrow.parquet as pq
+
+    # Read only the columns the transform uses - parquet column pruning
+    # skips decoding the rest of the file entirely
+    path = "./data/raw_prescriptions.parquet"
+    available = set(pq.ParquetFile(path).schema_arrow.names)
+    test_data = pd.read_parquet(
+        path, columns=[c for c in TRANSFORM_COLUMNS if c in available]
+    )
     print(f"Loaded {len(test_data):,} raw prescriptions")
 
     schema = transform_to_star_schema(test_data)